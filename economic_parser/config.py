@@ -10,17 +10,98 @@ class Config:
     TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
     TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
     TARGET_CHANNEL_ID = os.getenv('TARGET_CHANNEL_ID')
-    # ID канала для новостей (может отличаться от основного)
-    NEWS_CHANNEL_ID = os.getenv('TARGET_CHANNEL_ID')  # Или отдельный ID
+    # Адрес Bot API (например, локальный telegram-bot-api или тестовый сервер); пусто - api.telegram.org
+    TELEGRAM_API_SERVER = os.getenv('TELEGRAM_API_SERVER')
+
+    # Получение обновлений через webhook вместо long polling (по умолчанию выключено)
+    WEBHOOK_ENABLED = os.getenv('WEBHOOK_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Публичный https-адрес без пути, например https://bot.example.com
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Пусто - генерируется при каждом запуске
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 8))  # Одновременно обрабатываемых обновлений
+
+    # Лимиты Bot API: ~30 сообщений/с на бота, 1/с в личный чат, 20/мин в группу или канал
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+    TELEGRAM_PRIVATE_CHAT_RATE = float(os.getenv('TELEGRAM_PRIVATE_CHAT_RATE', 1))
+    TELEGRAM_GROUP_RATE = float(os.getenv('TELEGRAM_GROUP_RATE', 20 / 60))
+    TELEGRAM_GROUP_BURST = int(os.getenv('TELEGRAM_GROUP_BURST', 3))  # Сообщений подряд без паузы
+    TELEGRAM_SEND_RETRIES = int(os.getenv('TELEGRAM_SEND_RETRIES', 5))  # Повторы при 429 и сетевых ошибках
+    TELEGRAM_BACKOFF_BASE = float(os.getenv('TELEGRAM_BACKOFF_BASE', 1))  # Первая пауза после сетевой ошибки, сек
+    # Скриншоты: формат Playwright (png или jpeg) и качество JPEG; file_id загруженных фото кэшируются
+    SCREENSHOT_FORMAT = os.getenv('SCREENSHOT_FORMAT', 'jpeg')
+    SCREENSHOT_QUALITY = int(os.getenv('SCREENSHOT_QUALITY', 80))
+    PHOTO_CACHE_SIZE = int(os.getenv('PHOTO_CACHE_SIZE', 256))
+    # Outbox: сообщения хранятся в БД до подтверждения доставки
+    OUTBOX_BATCH = int(os.getenv('OUTBOX_BATCH', 20))  # Сообщений за одно чтение outbox
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+    OUTBOX_RETRY_BASE = float(os.getenv('OUTBOX_RETRY_BASE', 30))  # Первая пауза перед повтором, сек
+    ALBUM_SIZE = min(int(os.getenv('ALBUM_SIZE', 10)), 10)  # Фото-новостей в одном альбоме (лимит Telegram - 10)
+    ALBUM_WAIT = float(os.getenv('ALBUM_WAIT', 20))  # Сколько новость с фото ждет соседей для альбома, сек
+    PINNED_EDIT_WINDOW = float(os.getenv('PINNED_EDIT_WINDOW', 3))  # Обновления закрепа за окно - одна правка, сек
+    # Канал, куда новости уходят сразу, без модерации в TELEGRAM_CHAT_ID (пусто - не используется)
+    NEWS_CHANNEL_ID = os.getenv('NEWS_CHANNEL_ID')
+    # Куда публиковать каждый тип контента: "news=-1001,-1002;stocks=-1001", "*" - все типы.
+    # TELEGRAM_CHAT_ID получает все всегда и единственный - с кнопками модерации
+    DESTINATIONS = os.getenv('DESTINATIONS', '')
     
     # База данных
-    RECREATE_DB = False
     DB_PATH = "data/economic_parser.db"  # Изменил путь для лучшей организации
     DB_CLEANUP_DAYS = 30
+    # PRAGMA постоянного соединения (WAL)
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')  # NORMAL безопасен в режиме WAL
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 16384))  # Кэш страниц на соединение
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 64 * 1024 * 1024))  # 0 - без отображения в память
+    DB_TEMP_STORE = os.getenv('DB_TEMP_STORE', 'MEMORY')
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+    # Поток записи объединяет операции из очереди в одну транзакцию
+    DB_WRITE_BATCH_SIZE = int(os.getenv('DB_WRITE_BATCH_SIZE', 200))
+    DB_WRITE_BATCH_WINDOW = float(os.getenv('DB_WRITE_BATCH_WINDOW', 0.02))  # сек ожидания следующих записей
+    # Обслуживание: устаревшие строки удаляются короткими транзакциями, файл сжимается в простое
+    NEWS_TTL_DAYS = os.getenv('NEWS_TTL_DAYS', '')  # "tradingeconomics=7;company_reports=90", иначе DB_CLEANUP_DAYS
+    PINNED_KEEP_DAYS = int(os.getenv('PINNED_KEEP_DAYS', 7))  # Дней истории закрепа
+    DB_MAINTENANCE_BATCH = int(os.getenv('DB_MAINTENANCE_BATCH', 500))  # Строк за одну транзакцию удаления
+    DB_VACUUM_PAGES = int(os.getenv('DB_VACUUM_PAGES', 2000))  # Страниц за один PRAGMA incremental_vacuum
     
     # Интервалы
     UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', 1800))  # 30 мин
-    
+
+    # Расписание парсеров: число - интервал в секундах, иначе cron "минута час день месяц день_недели"
+    SCHEDULE = {
+        'moex': os.getenv('SCHEDULE_MOEX', '*/5 9-19 * * 1-5'),  # Котировки во время торгов
+        'dividends': os.getenv('SCHEDULE_DIVIDENDS', '0 9,18 * * *'),
+        'news': os.getenv('SCHEDULE_NEWS', '900'),
+        'tradingeconomics': os.getenv('SCHEDULE_TRADINGECONOMICS', str(UPDATE_INTERVAL)),
+        'company_reports': os.getenv('SCHEDULE_COMPANY_REPORTS', '3600'),
+        'maintenance': os.getenv('SCHEDULE_MAINTENANCE', '3600'),  # Очистка и сжатие БД
+        'metrics': os.getenv('SCHEDULE_METRICS', '3600')  # Сводка метрик Bot API в лог
+    }
+    SCHEDULE_JITTER = int(os.getenv('SCHEDULE_JITTER', 60))  # Случайная задержка запуска, сек
+
+    # Браузер (общий Chromium для всех парсеров)
+    BROWSER_MAX_PAGES = int(os.getenv('BROWSER_MAX_PAGES', 4))  # Одновременно открытых страниц
+    BROWSER_RECYCLE_AFTER = int(os.getenv('BROWSER_RECYCLE_AFTER', 200))  # Перезапуск после N переходов
+
+    # HTTP-клиент для новостных источников
+    HTTP_USER_AGENT = os.getenv(
+        'HTTP_USER_AGENT',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    )
+    HTTP_TIMEOUT = int(os.getenv('HTTP_TIMEOUT', 15))  # секунд на запрос
+    HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 20))
+    HTTP_MAX_PER_HOST = int(os.getenv('HTTP_MAX_PER_HOST', 4))
+
+    # Новостные источники
+    NEWS_MAX_CONCURRENT_SOURCES = int(os.getenv('NEWS_MAX_CONCURRENT_SOURCES', 4))
+    NEWS_SOURCE_TIMEOUT = int(os.getenv('NEWS_SOURCE_TIMEOUT', 90))  # секунд на один источник
+
+    # Рыночные данные: раздел публикуется, только если цена хотя бы одного инструмента сдвинулась на столько %
+    SNAPSHOT_MIN_CHANGE = float(os.getenv('SNAPSHOT_MIN_CHANGE', 0.1))
+
+    # Команда /search: результатов в ответе
+    SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', 10))
+
     # Yandex Cloud
     YANDEX_FUNCTION_ID = os.getenv('YANDEX_FUNCTION_ID')
     YANDEX_FOLDER_ID = os.getenv('YANDEX_FOLDER_ID')
@@ -31,6 +112,31 @@ class Config:
         'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     }
     
+    @classmethod
+    def news_ttl_days(cls, source: str) -> int:
+        """Сколько дней хранить новости источника (должно быть дольше, чем новость висит на его странице)"""
+        for item in filter(None, (item.strip() for item in cls.NEWS_TTL_DAYS.split(';'))):
+            name, _, days = item.partition('=')
+            if name.strip() == source:
+                return int(days)
+        return cls.DB_CLEANUP_DAYS
+
+    @classmethod
+    def destinations(cls, content_type: str) -> list:
+        """Чаты для типа контента: чат модерации, затем каналы из DESTINATIONS и NEWS_CHANNEL_ID.
+
+        Служебные сообщения сюда не маршрутизируются: safe_send(review_only=True) шлет их только в чат модерации.
+        """
+        chats = [str(cls.TELEGRAM_CHAT_ID)]
+        if content_type == 'news' and cls.NEWS_CHANNEL_ID:
+            chats.append(str(cls.NEWS_CHANNEL_ID))
+        for route in filter(None, (route.strip() for route in cls.DESTINATIONS.split(';'))):
+            types, _, route_chats = route.partition('=')
+            types = {route_type.strip() for route_type in types.split(',')}
+            if content_type in types or '*' in types:
+                chats.extend(chat.strip() for chat in route_chats.split(',') if chat.strip())
+        return list(dict.fromkeys(chats))
+
     @classmethod
     def check_required(cls):
         """Проверка обязательных настроек"""
@@ -42,6 +148,8 @@ class Config:
             cls.TELEGRAM_CHAT_ID,
             cls.TARGET_CHANNEL_ID
         ]
+        if cls.WEBHOOK_ENABLED and not cls.WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL is required when WEBHOOK_ENABLED is set")
         if not all(required):
             missing = [name for name, val in zip(
                 ['TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID', 'TARGET_CHANNEL_ID'],
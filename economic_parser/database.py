@@ -1,114 +1,458 @@
 import sqlite3
+import asyncio
+import hashlib
+import json
 import logging
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from datetime import date, datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterable, Set, Tuple, Callable, Any
 from config import Config
 
 logger = logging.getLogger(__name__)
 
 class NewsDatabase:
+    """Хранилище бота на двух постоянных соединениях SQLite в режиме WAL.
+
+    Все записи проходят через очередь единственного потока записи, который объединяет
+    их в общие транзакции; чтения выполняются в отдельном потоке. Асинхронные методы
+    не блокируют event loop, синхронные записи ставятся в очередь без ожидания.
+    """
+
     def __init__(self, db_path: str = None):
         self.db_path = Path(db_path) if db_path else Path(Config.DB_PATH)
-        self._init_db()  # Инициализация БД при создании экземпляра
+        self._init_db()  # Миграции схемы; на актуальной БД - только чтение user_version
+
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+        self._writer.start()
+
+        self._read_conn = None
+        self._reader = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='db-reader',
+            initializer=self._open_reader
+        )
+
+        # Все ID новостей за DB_CLEANUP_DAYS в памяти: повторная новость не требует обращения к диску.
+        # Точное множество вместо фильтра Блума: за 30 дней это тысячи строк, ложные срабатывания не нужны
+        self._known_ids = self._load_known_ids()
 
     def _init_db(self):
-        """Полная инициализация структуры БД"""
+        """Приводит схему к последней версии по PRAGMA user_version.
+
+        На актуальной БД это одно чтение версии. Иначе по порядку применяются недостающие
+        миграции; каждая идемпотентна или выполняется одной транзакцией, поэтому прерванная
+        повторится при следующем запуске.
+        Новое изменение схемы - новый метод в конце списка, существующие не меняются.
+        """
         # Создаем директорию для БД, если её нет
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with sqlite3.connect(self.db_path) as conn:
-            # Таблица новостей
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS news (
-                    id TEXT PRIMARY KEY,
-                    source TEXT,
-                    title TEXT,
-                    url TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-        
-            # Таблица закрепленных сообщений
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS pinned_messages (
-                    date TEXT PRIMARY KEY,
-                    message_id INTEGER,
-                    last_updated TEXT
-                )
-            ''')
-        
-            # Таблица разделов закрепленных сообщений
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS pinned_sections (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT,
-                    section_type TEXT,
-                    content TEXT,
-                    update_time TEXT,
-                    UNIQUE(date, section_type)
-                )
-            ''')
-        
-            # Индексы для ускорения запросов
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_news_id ON news (id)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_news_timestamp ON news (timestamp)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_pinned_date ON pinned_messages (date)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_sections_date ON pinned_sections (date)')
+
+        migrations = [
+            self._migrate_base,
+            self._migrate_outbox,
+            self._migrate_market_snapshots,
+            self._migrate_news_keys,
+            self._migrate_news_indexes,
+            self._migrate_snapshot_published,
+        ]
+        conn = sqlite3.connect(self.db_path)
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version == len(migrations):
+                return
+            if version > len(migrations):
+                raise RuntimeError(f"Database schema version {version} is newer than supported {len(migrations)}")
+            for number, migration in enumerate(migrations[version:], version + 1):
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {number}')
+                conn.commit()
+                logger.info(f"Database schema migrated to version {number}")
+        finally:
+            conn.close()
+
+    def _migrate_base(self, conn: sqlite3.Connection):
+        """Версия 1: режимы файла и исходные таблицы"""
+        # Освободившиеся страницы возвращаются порциями через PRAGMA incremental_vacuum.
+        # Файл, созданный без этого режима, один раз перестраивается
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
+
+        # Режим WAL хранится в файле БД: чтение не блокирует запись и наоборот
+        conn.execute('PRAGMA journal_mode=WAL')
+
+        # Таблица новостей; id - ключ дедупликации (news_key ссылки), он же rowid
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS news (
+                id INTEGER PRIMARY KEY,
+                source TEXT,
+                title TEXT,
+                url TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Таблица закрепленных сообщений
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pinned_messages (
+                date TEXT PRIMARY KEY,
+                message_id INTEGER,
+                last_updated TEXT
+            )
+        ''')
+
+        # Таблица разделов закрепленных сообщений
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pinned_sections (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT,
+                section_type TEXT,
+                content TEXT,
+                update_time TEXT,
+                UNIQUE(date, section_type)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_pinned_date ON pinned_messages (date)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sections_date ON pinned_sections (date)')
+
+        # Валидаторы HTTP и хэши страниц-списков для пропуска неизмененных страниц
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS listing_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                updated_at TEXT
+            )
+        ''')
+
+    def _migrate_outbox(self, conn: sqlite3.Connection):
+        """Версия 2: исходящие сообщения - новость считается опубликованной только после подтверждения Telegram"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL,
+                chat_id TEXT,
+                content_type TEXT,
+                text TEXT,
+                image BLOB,
+                parse_mode TEXT,
+                news TEXT,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at REAL DEFAULT 0,
+                last_error TEXT,
+                message_ids TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                sent_at DATETIME
+            )
+        ''')
+        # Одинаковое сообщение не может дважды ждать отправки
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_pending_key ON outbox (idempotency_key) "
+            "WHERE status = 'pending'"
+        )
+        # Очередь каждого чата читается отдельно
+        conn.execute('DROP INDEX IF EXISTS idx_outbox_due')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_chat_due ON outbox (chat_id, status, next_attempt_at)')
+
+    def _migrate_market_snapshots(self, conn: sqlite3.Connection):
+        """Версия 3: снимки котировок, дивидендов, товаров и криптовалют (строки снимка имеют общий captured_at)"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS market_snapshots (
+                id INTEGER PRIMARY KEY,
+                section TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                price REAL,
+                change REAL,
+                quote_time TEXT,
+                source TEXT,
+                captured_at REAL NOT NULL
+            )
+        ''')
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_snapshots_section_time ON market_snapshots (section, captured_at)'
+        )
+
+    def _migrate_news_keys(self, conn: sqlite3.Connection):
+        """Версия 4: перевод news с TEXT-ключей (md5 ссылки) на целые news_key.
+
+        Все прежние ключи были md5 от url, поэтому новый ключ вычисляется из сохраненного url.
+        Ключи новостей в ожидающих сообщениях outbox пересчитываются так же.
+        """
+        columns = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(news)')}
+        if columns.get('id', 'INTEGER').upper() == 'INTEGER':
+            return
+
+        logger.info("Migrating news table to integer keys...")
+        conn.create_function('news_key', 1, self.news_key, deterministic=True)
+        # Вся перестройка - одна транзакция: sqlite3 сам открывает ее только перед INSERT,
+        # и без явного BEGIN прерванная миграция оставила бы news_new и удаленный news_fts
+        conn.execute('BEGIN')
+        try:
+            self._rebuild_news_with_keys(conn)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        conn.execute('VACUUM')  # Сразу возвращаем место, освобожденное старыми ключами
+
+    def _rebuild_news_with_keys(self, conn: sqlite3.Connection):
+        """Копирует news в таблицу с целыми ключами внутри транзакции _migrate_news_keys"""
+        # Полнотекстовый индекс ссылается на rowid старой таблицы - он будет построен заново
+        for trigger in ('news_fts_insert', 'news_fts_delete', 'news_fts_update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        conn.execute('DROP TABLE IF EXISTS news_fts')
+        # Остаток миграции, прерванной до появления явной транзакции
+        conn.execute('DROP TABLE IF EXISTS news_new')
+        conn.execute('''
+            CREATE TABLE news_new (
+                id INTEGER PRIMARY KEY,
+                source TEXT,
+                title TEXT,
+                url TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute(
+            'INSERT OR IGNORE INTO news_new (id, source, title, url, timestamp) '
+            'SELECT news_key(url), source, title, url, timestamp FROM news WHERE url IS NOT NULL ORDER BY timestamp'
+        )
+        migrated = conn.execute('SELECT COUNT(*) FROM news_new').fetchone()[0]
+        conn.execute('DROP TABLE news')  # Вместе с idx_news_id и остальными индексами
+        conn.execute('ALTER TABLE news_new RENAME TO news')
+
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'outbox'").fetchone():
+            pending = conn.execute("SELECT id, news FROM outbox WHERE status = 'pending'").fetchall()
+            for outbox_id, news in pending:
+                rows = [[self.news_key(row[3])] + list(row[1:]) for row in json.loads(news or '[]')]
+                conn.execute('UPDATE outbox SET news = ? WHERE id = ?', (json.dumps(rows, ensure_ascii=False), outbox_id))
+
+        logger.info(f"Migrated {migrated} news to integer keys")
+
+    def _migrate_news_indexes(self, conn: sqlite3.Connection):
+        """Версия 5: вторичные индексы news и полнотекстовый индекс заголовков"""
+        # Поиск по id - это поиск по rowid, отдельный индекс не нужен
+        conn.execute('DROP INDEX IF EXISTS idx_news_id')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_news_timestamp ON news (timestamp)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_news_source_timestamp ON news (source, timestamp)')
+
+        # External content: текст хранится только в news, индекс поддерживается триггерами;
+        # при первом создании заполняется из уже сохраненных новостей
+        fts_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'news_fts'").fetchone()
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+                title,
+                content='news',
+                content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS news_fts_insert AFTER INSERT ON news BEGIN
+                INSERT INTO news_fts (rowid, title) VALUES (new.rowid, new.title);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS news_fts_delete AFTER DELETE ON news BEGIN
+                INSERT INTO news_fts (news_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS news_fts_update AFTER UPDATE OF title ON news BEGIN
+                INSERT INTO news_fts (news_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+                INSERT INTO news_fts (rowid, title) VALUES (new.rowid, new.title);
+            END
+        ''')
+        if not fts_exists:
+            conn.execute("INSERT INTO news_fts (news_fts) VALUES ('rebuild')")
+
+    def _migrate_snapshot_published(self, conn: sqlite3.Connection):
+        """Версия 6: отметка опубликованных снимков - с последним из них сравнивается новый снимок"""
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(market_snapshots)')}
+        if 'published' in columns:
+            return
+        conn.execute('ALTER TABLE market_snapshots ADD COLUMN published INTEGER NOT NULL DEFAULT 0')
+        # До этой версии сохранялись только публикуемые снимки
+        conn.execute('UPDATE market_snapshots SET published = 1')
+
+    def _connect(self) -> sqlite3.Connection:
+        """Соединение с PRAGMA из Config (они действуют в пределах соединения)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout={Config.DB_BUSY_TIMEOUT_MS}')
+        conn.execute(f'PRAGMA synchronous={Config.DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size={-Config.DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={Config.DB_MMAP_SIZE}')
+        conn.execute(f'PRAGMA temp_store={Config.DB_TEMP_STORE}')
+        return conn
+
+    def _open_reader(self):
+        self._read_conn = self._connect()
+
+    @staticmethod
+    def news_key(url: str) -> int:
+        """Ключ дедупликации новости: 64-битный blake2b ссылки (знаковый, как INTEGER в SQLite)"""
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+    def _load_known_ids(self) -> Set[int]:
+        ids = set(self._read_sync(
+            lambda conn: [row[0] for row in conn.execute('SELECT id FROM news')]
+        ))
+        # Новости, ожидающие отправки в outbox, тоже не должны попасть в следующий цикл
+        for news in self._read_sync(
+            lambda conn: [row[0] for row in conn.execute("SELECT news FROM outbox WHERE status = 'pending'")]
+        ):
+            ids.update(row[0] for row in json.loads(news or '[]'))
+        logger.info(f"Loaded {len(ids)} known news IDs")
+        return ids
+
+    def _writer_loop(self):
+        """Поток записи: выполняет операции из очереди и фиксирует их пачками"""
+        conn = self._connect()
+        running = True
+        while running:
+            item = self._write_queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Короткое окно, чтобы записи соседних парсеров попали в одну транзакцию
+            deadline = time.monotonic() + Config.DB_WRITE_BATCH_WINDOW
+            while len(batch) < Config.DB_WRITE_BATCH_SIZE:
+                try:
+                    item = self._write_queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            self._commit_batch(conn, batch)
+        conn.close()
+        logger.info("Database writer stopped")
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list):
+        try:
+            results = [operation(conn) for operation, _ in batch]
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if len(batch) == 1:
+                self._resolve(batch[0][1], error=e)
+            else:
+                # Повторяем по одной, чтобы ошибка одной операции не отменила остальные
+                for entry in batch:
+                    self._commit_batch(conn, [entry])
+            return
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result=result)
+
+    @staticmethod
+    def _resolve(future: Optional[Future], result: Any = None, error: Exception = None):
+        if error is None:
+            if future is not None:
+                future.set_result(result)
+        elif future is not None:
+            future.set_exception(error)
+        else:
+            logger.error(f"Database write failed: {error}")
+
+    def _submit_write(self, operation: Callable[[sqlite3.Connection], Any], wait: bool = True) -> Optional[Future]:
+        """Ставит операцию в очередь записи; без wait ошибки только логируются"""
+        future = Future() if wait else None
+        self._write_queue.put((operation, future))
+        return future
+
+    async def _write(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполняет операцию в потоке записи и ждет фиксации транзакции"""
+        return await asyncio.wrap_future(self._submit_write(operation))
+
+    def _read_sync(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        return self._reader.submit(lambda: operation(self._read_conn)).result()
+
+    async def _read(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполняет чтение в потоке чтения, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader, lambda: operation(self._read_conn))
+
+    def close(self):
+        """Дожидается записи всей очереди и закрывает соединения"""
+        self._write_queue.put(None)
+        self._writer.join()
+        self._reader.submit(lambda: self._read_conn.close()).result()
+        self._reader.shutdown()
 
     def get_pinned_message_id(self) -> Optional[int]:
         """Получает ID закрепленного сообщения за сегодня"""
         today = date.today().isoformat()
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT message_id FROM pinned_messages WHERE date = ?',
-                (today,)
-            )
-            result = cursor.fetchone()
-            return result[0] if result else None
+        result = self._read_sync(lambda conn: conn.execute(
+            'SELECT message_id FROM pinned_messages WHERE date = ?',
+            (today,)
+        ).fetchone())
+        return result[0] if result else None
 
     def save_pinned_message(self, message_id: int):
         """Сохраняет или обновляет закрепленное сообщение"""
         today = date.today().isoformat()
         now_str = datetime.now().strftime('%H:%M')
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                'INSERT OR REPLACE INTO pinned_messages (date, message_id, last_updated) '
-                'VALUES (?, ?, ?)',
-                (today, message_id, now_str)
-            )
+        self._submit_write(lambda conn: conn.execute(
+            'INSERT OR REPLACE INTO pinned_messages (date, message_id, last_updated) '
+            'VALUES (?, ?, ?)',
+            (today, message_id, now_str)
+        ), wait=False)
 
     def get_pinned_sections(self) -> Dict[str, Dict]:
         """Получает все сохраненные разделы за сегодня"""
         today = date.today().isoformat()
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT section_type, content, update_time '
-                'FROM pinned_sections WHERE date = ?',
-                (today,)
-            )
-            
-            sections = {}
-            for row in cursor.fetchall():
-                sections[row[0]] = {
-                    'content': row[1],
-                    'time': row[2],
-                    'emoji': self._get_section_emoji(row[0])
-                }
-            return sections
+        rows = self._read_sync(lambda conn: conn.execute(
+            'SELECT section_type, content, update_time '
+            'FROM pinned_sections WHERE date = ?',
+            (today,)
+        ).fetchall())
+
+        sections = {}
+        for row in rows:
+            sections[row[0]] = {
+                'content': row[1],
+                'time': row[2],
+                'emoji': self._get_section_emoji(row[0])
+            }
+        return sections
 
     def save_pinned_section(self, section_type: str, content: str, update_time: str):
         """Сохраняет или обновляет раздел"""
         today = date.today().isoformat()
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                'INSERT OR REPLACE INTO pinned_sections '
-                '(date, section_type, content, update_time) '
-                'VALUES (?, ?, ?, ?)',
-                (today, section_type, content, update_time)
-            )
+        self._submit_write(lambda conn: conn.execute(
+            'INSERT OR REPLACE INTO pinned_sections '
+            '(date, section_type, content, update_time) '
+            'VALUES (?, ?, ?, ?)',
+            (today, section_type, content, update_time)
+        ), wait=False)
+
+    def get_listing_cache(self) -> Dict[str, Dict]:
+        """Получает сохраненные валидаторы и хэши всех страниц-списков (блокирующе, только при старте)"""
+        rows = self._read_sync(lambda conn: conn.execute(
+            'SELECT url, etag, last_modified, content_hash FROM listing_cache'
+        ).fetchall())
+        return {
+            row[0]: {'etag': row[1], 'last_modified': row[2], 'content_hash': row[3]}
+            for row in rows
+        }
+
+    def save_listing_cache(self, url: str, etag: Optional[str], last_modified: Optional[str], content_hash: Optional[str]):
+        """Сохраняет или обновляет валидаторы и хэш страницы-списка"""
+        updated_at = datetime.now().isoformat(timespec='seconds')
+        self._submit_write(lambda conn: conn.execute(
+            'INSERT OR REPLACE INTO listing_cache '
+            '(url, etag, last_modified, content_hash, updated_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (url, etag, last_modified, content_hash, updated_at)
+        ), wait=False)
 
     @staticmethod
     def _get_section_emoji(section_type: str) -> str:
@@ -121,36 +465,288 @@ class NewsDatabase:
         }
         return emojis.get(section_type, '📌')
 
+    async def _delete_batches(self, sql: str, params: tuple = ()) -> list:
+        """Удаляет строки пачками по DB_MAINTENANCE_BATCH, каждая пачка - отдельная короткая транзакция.
+
+        sql - DELETE ... LIMIT ? RETURNING ...; возвращает все возвращенные строки.
+        """
+        deleted = []
+        while True:
+            rows = await self._write(lambda conn: conn.execute(sql, params + (Config.DB_MAINTENANCE_BATCH,)).fetchall())
+            deleted.extend(rows)
+            if len(rows) < Config.DB_MAINTENANCE_BATCH:
+                return deleted
+
     async def cleanup_old_pins(self):
-        """Очистка старых закреплений"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Очистка закрепов и их разделов старше PINNED_KEEP_DAYS (сегодняшние не трогаются)"""
+        keep = (f"-{Config.PINNED_KEEP_DAYS} days",)
+        messages = await self._delete_batches(
+            'DELETE FROM pinned_messages WHERE date IN '
+            '(SELECT date FROM pinned_messages WHERE date < date("now", ?) LIMIT ?) RETURNING date',
+            keep
+        )
+        sections = await self._delete_batches(
+            'DELETE FROM pinned_sections WHERE id IN '
+            '(SELECT id FROM pinned_sections WHERE date < date("now", ?) LIMIT ?) RETURNING id',
+            keep
+        )
+        logger.info(f"Cleaned up {len(messages)} old pinned messages and {len(sections)} sections")
+
+    async def is_news_exists(self, news_id: int) -> bool:
+        """Проверка существования новости по индексу в памяти"""
+        return news_id in self._known_ids
+
+    async def add_news(self, news_id: int, source: str, title: str, url: str):
+        """Добавление новости в БД"""
+        await self._write(lambda conn: conn.execute('''
+            INSERT OR IGNORE INTO news (id, source, title, url)
+            VALUES (?, ?, ?, ?)
+        ''', (news_id, source, title, url)))
+        self._known_ids.add(news_id)
+        logger.debug(f"Added news: {title[:50]}...")
+
+    async def search_news(self, terms: str, sources: Iterable[str] = (), days: int = None, limit: int = 10) -> list:
+        """Поиск по заголовкам через FTS5, лучшие совпадения (bm25) первыми.
+
+        Каждое слово ищется как префикс ("нефт" найдет "нефть" и "нефти"), все слова обязательны.
+        sources - только эти источники, days - только за последние N дней.
+        """
+        words = re.findall(r'\w+', terms)
+        if not words:
+            return []
+        params = [' '.join(f'"{word}"*' for word in words)]
+        sql = (
+            'SELECT news.title, news.source, news.url, news.timestamp FROM news_fts '
+            'JOIN news ON news.rowid = news_fts.rowid WHERE news_fts MATCH ?'
+        )
+        sources = list(sources)
+        if sources:
+            sql += f" AND news.source IN ({','.join('?' * len(sources))})"
+            params.extend(sources)
+        if days:
+            sql += ' AND news.timestamp >= datetime("now", ?)'
+            params.append(f"-{days} days")
+        sql += ' ORDER BY bm25(news_fts) LIMIT ?'
+        params.append(limit)
+        rows = await self._read(lambda conn: conn.execute(sql, params).fetchall())
+        return [{'title': row[0], 'source': row[1], 'url': row[2], 'timestamp': row[3]} for row in rows]
+
+    async def filter_new(self, news_ids: Iterable[int]) -> Set[int]:
+        """Возвращает те из переданных ID, которых еще нет в БД (по индексу в памяти)"""
+        return set(news_ids) - self._known_ids
+
+    async def add_news_many(self, rows: Iterable[Tuple[int, str, str, str]]) -> int:
+        """Добавление пачки новостей (news_id, source, title, url) одной транзакцией"""
+        rows = list(rows)
+        if not rows:
+            return 0
+        inserted = await self._write(lambda conn: conn.executemany('''
+            INSERT OR IGNORE INTO news (id, source, title, url)
+            VALUES (?, ?, ?, ?)
+        ''', rows).rowcount)
+        self._known_ids.update(row[0] for row in rows)
+        logger.debug(f"Added {inserted} of {len(rows)} news")
+        return inserted
+
+    async def outbox_add(self, key: str, chat_id, text: str, image: Optional[bytes], content_type: str,
+                         parse_mode: str, news: Iterable[Tuple[int, str, str, str]] = ()) -> Optional[int]:
+        """Ставит сообщение в outbox; None, если такое же сообщение уже ждет отправки.
+
+        news - строки (news_id, source, title, url), которые попадут в таблицу news после доставки.
+        """
+        news = [list(row) for row in news]
+
+        def insert(conn):
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO outbox (idempotency_key, chat_id, text, image, content_type, parse_mode, news) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, str(chat_id), text, image, content_type, parse_mode, json.dumps(news, ensure_ascii=False))
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+
+        outbox_id = await self._write(insert)
+        if outbox_id:
+            self._known_ids.update(row[0] for row in news)
+        return outbox_id
+
+    async def outbox_pending_chats(self) -> list:
+        """Чаты, для которых в outbox есть неотправленные сообщения"""
+        rows = await self._read(lambda conn: conn.execute(
+            "SELECT DISTINCT chat_id FROM outbox WHERE status = 'pending'"
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    async def outbox_due(self, chat_id, limit: int) -> list:
+        """Сообщения чата, которые пора отправить, в порядке постановки.
+
+        Очередь чата строго упорядочена: выдаются сообщения с ее начала до первого, повтор
+        которого еще не наступил. Пока ждет первое сообщение, не уходят и следующие за ним.
+        """
+        rows = await self._read(lambda conn: conn.execute(
+            'SELECT id, chat_id, text, image, content_type, parse_mode, news, attempts, '
+            "CAST(strftime('%s', created_at) AS REAL), message_ids, next_attempt_at FROM outbox "
+            "WHERE chat_id = ? AND status = 'pending' ORDER BY id LIMIT ?",
+            (str(chat_id), limit)
+        ).fetchall())
+        now = time.time()
+        due = []
+        for row in rows:
+            if row[10] > now:
+                break
+            due.append({
+                'id': row[0], 'chat_id': row[1], 'text': row[2], 'image': row[3], 'content_type': row[4],
+                'parse_mode': row[5], 'news': json.loads(row[6] or '[]'), 'attempts': row[7], 'queued_at': row[8],
+                'message_ids': json.loads(row[9] or '[]')  # Части, доставленные прошлыми попытками
+            })
+        return due
+
+    async def save_market_snapshot(self, section: str, records: list, published: bool = False):
+        """Сохраняет снимок раздела: записи (ticker, price, change, quote_time, source) с общим временем"""
+        captured_at = time.time()
+        await self._write(lambda conn: conn.executemany(
+            'INSERT INTO market_snapshots (section, ticker, price, change, quote_time, source, captured_at, published) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [
+                (section, record['ticker'], record['price'], record['change'], record['quote_time'],
+                 record['source'], captured_at, int(published))
+                for record in records
+            ]
+        ))
+
+    async def get_last_published_snapshot(self, section: str) -> list:
+        """Записи последнего опубликованного снимка раздела"""
+        rows = await self._read(lambda conn: conn.execute(
+            'SELECT ticker, price, change, quote_time, source FROM market_snapshots '
+            'WHERE section = ? AND captured_at = '
+            '(SELECT MAX(captured_at) FROM market_snapshots WHERE section = ? AND published = 1)',
+            (section, section)
+        ).fetchall())
+        return [
+            {'ticker': row[0], 'price': row[1], 'change': row[2], 'quote_time': row[3], 'source': row[4]}
+            for row in rows
+        ]
+
+    async def outbox_sent_by_message(self, chat_id, message_id: int) -> list:
+        """Доставленные сообщения outbox, в message_ids которых есть message_id, в порядке постановки.
+
+        По ID сообщения с кнопками так находятся все части длинного текста, фото с продолжением
+        подписи или все новости альбома вместе с управляющим сообщением.
+        """
+        rows = await self._read(lambda conn: conn.execute(
+            "SELECT text, parse_mode, content_type, message_ids FROM outbox WHERE chat_id = ? AND status = 'sent' "
+            'AND EXISTS (SELECT 1 FROM json_each(outbox.message_ids) WHERE value = ?) ORDER BY id',
+            (str(chat_id), message_id)
+        ).fetchall())
+        return [
+            {'text': row[0], 'parse_mode': row[1], 'content_type': row[2], 'message_ids': json.loads(row[3])}
+            for row in rows
+        ]
+
+    async def outbox_next_attempt_at(self, chat_id) -> Optional[float]:
+        """Время попытки первого в очереди чата сообщения (unix time) или None, если очередь пуста"""
+        row = await self._read(lambda conn: conn.execute(
+            "SELECT next_attempt_at FROM outbox WHERE chat_id = ? AND status = 'pending' ORDER BY id LIMIT 1",
+            (str(chat_id),)
+        ).fetchone())
+        return row[0] if row else None
+
+    async def outbox_mark_sent(self, outbox_id: int, message_ids: list, news: list):
+        """Фиксирует доставку и новости сообщения одной транзакцией"""
+        def mark_sent(conn):
             conn.execute(
-                'DELETE FROM pinned_messages WHERE date < date("now", "-3 days")'
+                "UPDATE outbox SET status = 'sent', message_ids = ?, image = NULL, sent_at = CURRENT_TIMESTAMP "
+                'WHERE id = ?',
+                (json.dumps(message_ids), outbox_id)
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO news (id, source, title, url) VALUES (?, ?, ?, ?)',
+                [tuple(row) for row in news]
             )
-            logger.info("Cleaned up old pinned messages")
 
-    async def is_news_exists(self, news_id: str) -> bool:
-        """Проверка существования новости"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT 1 FROM news WHERE id = ?', (news_id,))
-            return cursor.fetchone() is not None
+        await self._write(mark_sent)
 
-    async def add_news(self, news_id: str, source: str, title: str, url: str):
-        """Добавление новости в БД"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                INSERT OR IGNORE INTO news (id, source, title, url)
-                VALUES (?, ?, ?, ?)
-            ''', (news_id, source, title, url))
-            logger.debug(f"Added news: {title[:50]}...")
+    async def outbox_mark_failed(self, outbox_id: int, error: str, attempts: int, next_attempt_at: float,
+                                 final: bool, news: list, message_ids: list = None):
+        """Откладывает повтор или окончательно снимает сообщение с отправки.
+
+        message_ids - уже доставленные части: повтор продолжит с первой недоставленной. Если часть
+        сообщения уже в чате, его новости считаются опубликованными и в следующий цикл не попадут.
+        """
+        news_ids = [row[0] for row in news]
+
+        def mark_failed(conn):
+            conn.execute(
+                'UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, message_ids = ? '
+                'WHERE id = ?',
+                ('failed' if final else 'pending', attempts, next_attempt_at, error,
+                 json.dumps(message_ids) if message_ids else None, outbox_id)
+            )
+            if not final or not news_ids:
+                return []
+            if message_ids:
+                conn.executemany(
+                    'INSERT OR IGNORE INTO news (id, source, title, url) VALUES (?, ?, ?, ?)',
+                    [tuple(row) for row in news]
+                )
+                return []
+            # Новость, доставленная в другой чат или еще ждущая отправки туда, остается известной
+            placeholders = ','.join('?' * len(news_ids))
+            kept = {row[0] for row in conn.execute(f'SELECT id FROM news WHERE id IN ({placeholders})', news_ids)}
+            kept.update(row[0] for row in conn.execute(
+                "SELECT json_extract(item.value, '$[0]') FROM outbox, json_each(outbox.news) AS item "
+                "WHERE outbox.status = 'pending'"
+            ))
+            return [news_id for news_id in news_ids if news_id not in kept]
+
+        # Недоставленные новости можно будет взять в следующем цикле
+        self._known_ids.difference_update(await self._write(mark_failed))
 
     async def cleanup_old_news(self):
-        """Очистка старых записей"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'DELETE FROM news WHERE timestamp < datetime("now", ?)',
-                (f"-{Config.DB_CLEANUP_DAYS} days",)
+        """Удаление устаревших новостей (срок хранения - по источнику), outbox и снимков рынка"""
+        sources = await self._read(lambda conn: [row[0] for row in conn.execute('SELECT DISTINCT source FROM news')])
+        deleted = 0
+        for source in sources:
+            # RETURNING отдает ровно удаленные ID, по ним же чистится индекс в памяти
+            rows = await self._delete_batches(
+                'DELETE FROM news WHERE rowid IN (SELECT rowid FROM news '
+                'WHERE source IS ? AND timestamp < datetime("now", ?) LIMIT ?) RETURNING id',
+                (source, f"-{Config.news_ttl_days(source)} days")
             )
-            logger.info(f"Cleaned up {cursor.rowcount} old records")
\ No newline at end of file
+            self._known_ids.difference_update(row[0] for row in rows)
+            deleted += len(rows)
+
+        cutoff = (f"-{Config.DB_CLEANUP_DAYS} days",)
+        outbox = await self._delete_batches(
+            "DELETE FROM outbox WHERE id IN (SELECT id FROM outbox WHERE status != 'pending' "
+            'AND created_at < datetime("now", ?) LIMIT ?) RETURNING id',
+            cutoff
+        )
+        # Последний опубликованный снимок каждого раздела остается для сравнения, даже если он старый
+        snapshots = await self._delete_batches(
+            'DELETE FROM market_snapshots WHERE id IN (SELECT id FROM market_snapshots '
+            "WHERE captured_at < CAST(strftime('%s', 'now', ?) AS REAL) "
+            'AND captured_at IS NOT (SELECT MAX(captured_at) FROM market_snapshots AS last '
+            'WHERE last.section = market_snapshots.section AND last.published = 1) LIMIT ?) RETURNING id',
+            cutoff
+        )
+        logger.info(f"Cleaned up {deleted} old news, {len(outbox)} outbox rows and {len(snapshots)} snapshot rows")
+
+    async def run_maintenance(self, is_idle: Callable[[], bool] = None):
+        """Периодическое обслуживание: удаление устаревшего пачками, затем в простое сжатие и optimize"""
+        await self.cleanup_old_news()
+        await self.cleanup_old_pins()
+        if is_idle is not None and not is_idle():
+            logger.info("Parsers are running, vacuum postponed")
+            return
+
+        free_pages = await self._read(lambda conn: conn.execute('PRAGMA freelist_count').fetchone()[0])
+        if free_pages:
+            # Ограниченное число страниц за раз, чтобы не держать блокировку записи долго.
+            # sqlite3 делает один шаг запроса, а каждый шаг incremental_vacuum освобождает одну страницу
+            def vacuum(conn):
+                for _ in range(min(free_pages, Config.DB_VACUUM_PAGES)):
+                    conn.execute('PRAGMA incremental_vacuum(1)')
+
+            await self._write(vacuum)
+        await self._write(lambda conn: conn.execute('PRAGMA optimize').fetchall())
+        logger.info(f"Database maintenance done, {free_pages} free pages before vacuum")
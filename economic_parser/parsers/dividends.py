@@ -1,14 +1,17 @@
 import logging
-from playwright.async_api import async_playwright
 from services.telegram_client import TelegramClient
+from services.browser_pool import BrowserPool
+from services.market_snapshots import MarketSnapshots
 from aiogram import Bot, Dispatcher, F
 from database import NewsDatabase
 
 logger = logging.getLogger(__name__)
 
 class DividendsParser:
-    def __init__(self, dp: Dispatcher, db: NewsDatabase):  # Добавляем параметр db
-        self.tg = TelegramClient(dp, db)  # Передаем оба параметра
+    def __init__(self, tg: TelegramClient, db: NewsDatabase, browser: BrowserPool, snapshots: MarketSnapshots):
+        self.tg = tg  # Общий клиент Telegram
+        self.browser = browser  # Общий пул Chromium
+        self.snapshots = snapshots  # Публикация только при изменении списка дивидендов
         self.base_timeout = 45000  # 45 секунд для основных операций
         self.load_timeout = 90000  # 90 секунд для загрузки страницы
         self.db = db  # Сохраняем ссылку на БД для возможного будущего использования
@@ -16,15 +19,13 @@ class DividendsParser:
     async def parse(self):
         """Парсинг дивидендов с SmartLab"""
         try:
-            async with async_playwright() as pw:
-                browser = await pw.chromium.launch()
-                page = await browser.new_page()
-                
+            async with self.browser.page() as page:
                 await page.goto('https://smart-lab.ru/dividends/', timeout=60000)
                 await page.wait_for_selector('table.simple-little-table', timeout=15000)
                 
                 rows = await page.query_selector_all('table.simple-little-table tbody tr.dividend_approved')
                 dividends = []
+                records = []
                 
                 for row in rows[:10]:  # Только топ-10
                     try:
@@ -42,20 +43,24 @@ class DividendsParser:
                                 f"дата выплаты: {payment_date or 'не указана'}"
                             )
                             dividends.append(div_str)
+                            # Цена записи - размер дивиденда, изменение - доходность, время - дата выплаты
+                            records.append(MarketSnapshots.record(ticker, amount, yield_pct, payment_date, source='smart-lab'))
                     except Exception as e:
                         logger.warning(f"Dividend row error: {str(e)[:100]}")
                         continue
                 
                 if dividends:
+                    if not await self.snapshots.update('dividends', records):
+                        return True
                     await self.tg.safe_send("💵 <b>Ближайшие дивиденды:</b>\n" + "\n".join(dividends),
     content_type='dividends')
                 else:
                     await self.tg.safe_send("ℹ️ Нет данных о дивидендах",
-    content_type='dividends')
+    content_type='dividends', review_only=True)
                 
                 return True
         except Exception as e:
             logger.error(f"Dividend parse failed: {str(e)}")
             await self.tg.safe_send("⚠️ Ошибка получения данных по дивидендам",
-    content_type='dividends')
+    content_type='dividends', review_only=True)
             return False
\ No newline at end of file
@@ -1,8 +1,9 @@
 import asyncio
 import logging
 from datetime import datetime
-from playwright.async_api import async_playwright
 from services.telegram_client import TelegramClient
+from services.browser_pool import BrowserPool
+from services.market_snapshots import MarketSnapshots
 from config import Config
 from aiogram import Bot, Dispatcher, F
 from database import NewsDatabase
@@ -10,8 +11,10 @@ from database import NewsDatabase
 logger = logging.getLogger(__name__)
 
 class MOEXParser:
-    def __init__(self, dp: Dispatcher, db: NewsDatabase):  # Добавляем параметр db
-        self.tg = TelegramClient(dp, db)  # Передаем оба параметра
+    def __init__(self, tg: TelegramClient, db: NewsDatabase, browser: BrowserPool, snapshots: MarketSnapshots):
+        self.tg = tg  # Общий клиент Telegram
+        self.browser = browser  # Общий пул Chromium
+        self.snapshots = snapshots  # Публикация только при существенном изменении котировок
         self.base_timeout = 45000  # 45 секунд для основных операций
         self.load_timeout = 90000  # 90 секунд для загрузки страницы
         self.db = db  # Сохраняем ссылку на БД для возможного будущего использования
@@ -45,8 +48,9 @@ class MOEXParser:
             return False
 
     async def parse_indexes(self, page):
-        """Парсинг основных индексов MOEX с переключением страниц"""
+        """Парсинг основных индексов MOEX с переключением страниц; возвращает строки, дату торгов и записи снимка"""
         indexes = []
+        records = []
         try:
             # Получаем дату торгов из заголовка
             trade_date = await page.locator('header h2:first-child').text_content()
@@ -66,21 +70,24 @@ class MOEXParser:
             rgbi = await self._get_index_data(page, 'RGBI', 'Индекс Мосбиржи гос обл RGBI', trade_date)
             
             if imoex:
-                indexes.append(imoex)
+                indexes.append(imoex[0])
+                records.append(imoex[1])
             else:
                 indexes.append(f"ℹ️ Индекс МосБиржи (IMOEX): данные недоступны ({trade_date})")
                 
             if rts:
-                indexes.append(rts)
+                indexes.append(rts[0])
+                records.append(rts[1])
             else:
                 indexes.append(f"ℹ️ Индекс РТС (RTSI): данные недоступны ({trade_date})")
                 
             if rgbi:
-                indexes.append(rgbi)
+                indexes.append(rgbi[0])
+                records.append(rgbi[1])
             else:
                 indexes.append(f"ℹ️ Индекс гос. облигаций (RGBI): данные недоступны ({trade_date})")
                 
-            return indexes, trade_date
+            return indexes, trade_date, records
             
         except Exception as e:
             logger.error(f"Error parsing indexes: {str(e)[:200]}")
@@ -88,15 +95,7 @@ class MOEXParser:
                 "ℹ️ Индекс МосБиржи (IMOEX): данные недоступны",
                 "ℹ️ Индекс РТС (RTSI): данные недоступны",
                 "ℹ️ Индекс гос. облигаций (RGBI): данные недоступны"
-            ], "дата неизвестна"
-            
-        except Exception as e:
-            logger.error(f"Error parsing indexes: {str(e)[:200]}")
-            return [
-                "ℹ️ Индекс МосБиржи (IMOEX): данные недоступны",
-                "ℹ️ Индекс РТС (RTSI): данные недоступны",
-                "ℹ️ Индекс гос. облигаций (RGBI): данные недоступны"
-            ], "дата неизвестна"
+            ], "дата неизвестна", []
 
     async def _get_index_data(self, page, ticker, name, trade_date):
         """Поиск данных конкретного индекса с перебором страниц"""
@@ -149,7 +148,7 @@ class MOEXParser:
             return None
 
     async def _check_current_page_for_index(self, page, ticker, name, trade_date):
-        """Проверка текущей страницы на наличие нужного индекса"""
+        """Проверка текущей страницы на наличие нужного индекса; возвращает строку и запись снимка"""
         try:
             rows = await page.query_selector_all('.ui-table-row.-interactive')
             for row in rows:
@@ -162,12 +161,14 @@ class MOEXParser:
                         row_name = parts[1].replace('\xa0', ' ').strip()
 
                         if row_ticker == ticker and row_name == name:
+                            record = MarketSnapshots.record(ticker, parts[2], parts[3], source='moex')
                             price = parts[2].replace('.', ',')
                             change = parts[3].replace('.', ',')
                             time_elem = await row.query_selector('td:last-child div')
                             time = await time_elem.text_content() if time_elem else "время неизвестно"
+                            record['quote_time'] = time.strip()
                             emoji = "🟢" if '+' in change else "🔴" if '-' in change else "⚪"
-                            return f"{emoji} {name} ({ticker}): {price} {change} | {time}"
+                            return f"{emoji} {name} ({ticker}): {price} {change} | {time}", record
                 except:
                     continue
             return None
@@ -176,8 +177,9 @@ class MOEXParser:
             return None
 
     async def parse_stocks(self, page, trade_date):
-        """Парсинг топовых акций MOEX"""
+        """Парсинг топовых акций MOEX; возвращает строки и записи снимка"""
         stocks = []
+        records = []
         try:
             # Переключаемся на акции
             await page.select_option('#securitygroups', value='4', timeout=self.base_timeout)
@@ -204,7 +206,8 @@ class MOEXParser:
                     name = (await cells[1].text_content()).strip()
                     
                     # Цена из третьего столбца
-                    price = (await cells[2].text_content()).strip().replace('.', ',')
+                    raw_price = (await cells[2].text_content()).strip()
+                    price = raw_price.replace('.', ',')
                     
                     # Изменение из четвертого столбца
                     #change_elem = cells[3]
@@ -230,16 +233,17 @@ class MOEXParser:
                         emoji = "⚪"
                         change = f"{change.replace('%', '').strip()}%"
                     stocks.append(f"{emoji} {name} ({ticker}): {price} {change} | {time}")
+                    records.append(MarketSnapshots.record(ticker, raw_price, change, time, source='moex'))
                     
                 except Exception as e:
                     logger.warning(f"Error parsing stock row: {str(e)[:100]}")
                     continue
                     
-            return stocks if stocks else [f"ℹ️ Котировки акций временно недоступны"]
+            return (stocks, records) if stocks else ([f"ℹ️ Котировки акций временно недоступны"], [])
             
         except Exception as e:
             logger.error(f"Error parsing stocks: {str(e)[:200]}")
-            return [f"ℹ️ Ошибка при получении данных по акциям"]
+            return [f"ℹ️ Ошибка при получении данных по акциям"], []
 
     async def _click_with_retry(self, page, selector, attempts=3, delay=2):
         """Повторные попытки клика с задержкой"""
@@ -257,27 +261,24 @@ class MOEXParser:
 
     async def parse(self):
         """Основной метод парсинга данных с MOEX"""
-        async with async_playwright() as pw:
-            browser = await pw.chromium.launch(
-                headless=True,
-                timeout=self.load_timeout
-            )
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            )
-            page = await context.new_page()
-            
+        async with self.browser.page(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+        ) as page:
             try:
                 # Загрузка основной страницы
                 await page.goto('https://www.moex.com/ru/marketdata/', timeout=self.load_timeout)
                 await self.handle_disclaimer(page)
                 
                 # Парсим индексы и получаем дату торгов
-                indexes, trade_date = await self.parse_indexes(page)
+                indexes, trade_date, index_records = await self.parse_indexes(page)
                 
                 # Парсим акции
-                stocks = await self.parse_stocks(page, trade_date)
+                stocks, stock_records = await self.parse_stocks(page, trade_date)
+
+                # В выходные и вне торгов таблица не меняется - повторно ее не публикуем
+                if not await self.snapshots.update('stocks', index_records + stock_records):
+                    return True
                 
                 # Формируем сообщение с заголовком
                 message = f"📊 <b>Рынок акций и индексы (Ход торгов, {trade_date}):</b>\n" + "\n".join(indexes)
@@ -289,9 +290,5 @@ class MOEXParser:
                 
             except Exception as e:
                 logger.error(f"MOEX parsing failed: {str(e)}")
-                await self.tg.safe_send("⚠️ Ошибка получения данных с MOEX", content_type='stocks')
-                return False
-                
-            finally:
-                await context.close()
-                await browser.close()
\ No newline at end of file
+                await self.tg.safe_send("⚠️ Ошибка получения данных с MOEX", content_type='stocks', review_only=True)
+                return False
\ No newline at end of file
@@ -1,15 +1,16 @@
 import re
 import logging
-import hashlib
-import requests
+import time
 import asyncio
 import feedparser
 from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
+from config import Config
 from services.telegram_client import TelegramClient
 from utils.html_formatter import HTMLFormatter
 from database import NewsDatabase
-from playwright.async_api import async_playwright
+from services.browser_pool import BrowserPool
+from services.http_client import HttpClient
 from aiogram import Bot, Dispatcher, F
 from urllib.parse import urljoin
 
@@ -17,8 +18,10 @@ from urllib.parse import urljoin
 logger = logging.getLogger(__name__)
 
 class RussianNewsParser:
-    def __init__(self, dp: Dispatcher, db: NewsDatabase):  # Добавляем параметр db
-        self.tg = TelegramClient(dp, db)  # Передаем оба параметра
+    def __init__(self, tg: TelegramClient, db: NewsDatabase, browser: BrowserPool, http: HttpClient):
+        self.tg = tg  # Общий клиент Telegram
+        self.browser = browser  # Общий пул Chromium
+        self.http = http  # Общий асинхронный HTTP-клиент
         self.base_timeout = 45000  # 45 секунд для основных операций
         self.load_timeout = 90000  # 90 секунд для загрузки страницы
         self.db = db  # Сохраняем ссылку на БД для возможного будущего использования
@@ -34,6 +37,7 @@ class RussianNewsParser:
             'cbr': self.parse_cbr,
             'rbc': self.parse_rbc
         }
+        self._sources_semaphore = asyncio.Semaphore(Config.NEWS_MAX_CONCURRENT_SOURCES)
 
     def _russian_month_to_num(self, month_ru):
         months = {
@@ -44,12 +48,15 @@ class RussianNewsParser:
         }
         return months.get(month_ru.lower(), '01')
     
-    async def parse_tass(self):
+    async def parse_tass(self, listings: list):
         """Парсинг новостей ТАСС"""
         news = []
         try:
-            response = requests.get('https://tass.ru/ekonomika', timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            html, validators = await self.http.get_listing('https://tass.ru/ekonomika', timeout=10)
+            if html is None:
+                return news
+            listings.append(validators)
+            soup = BeautifulSoup(html, 'html.parser')
             
             for card in soup.select('div[class*="card"], div[class*="article"]')[:15]:
                 try:
@@ -65,9 +72,7 @@ class RussianNewsParser:
                         link = f"https://tass.ru{link}"
                         #print(f'link = {link}')
                     
-                    news_id = hashlib.md5(link.encode()).hexdigest()
-                    if await self.db.is_news_exists(news_id):
-                        continue
+                    news_id = NewsDatabase.news_key(link)
                     
                     time_elem = card.select_one('div[class*="time"], time, span[class*="date"]')
                     time_text = time_elem.get_text(strip=True) if time_elem else ""
@@ -82,8 +87,7 @@ class RussianNewsParser:
                         date_str = time_text
                     
                     news_item = f"{title} ({date_str}) <a href='{link}'>— ТАСС</a>"
-                    news.append(news_item)
-                    await self.db.add_news(news_id, 'tass', title, link)
+                    news.append((news_id, title, link, news_item))
                 except Exception as e:
                     logger.warning(f"TASS card error: {str(e)[:100]}")
                     continue
@@ -93,12 +97,15 @@ class RussianNewsParser:
             logger.error(f"TASS parse failed: {str(e)[:200]}")
             return []
 
-    async def parse_ria(self):
+    async def parse_ria(self, listings: list):
         """Парсинг новостей РИА"""
         news = []
         try:
-            response = requests.get('https://ria.ru/economy/', timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            html, validators = await self.http.get_listing('https://ria.ru/economy/', marker='list-item__title', timeout=10)
+            if html is None:
+                return news
+            listings.append(validators)
+            soup = BeautifulSoup(html, 'html.parser')
 
             for item in soup.select('div.list-item')[:15]:
                 try:
@@ -124,15 +131,11 @@ class RussianNewsParser:
                     else:
                         date_str = date_text
                 
-                    news_id = hashlib.md5(link.encode()).hexdigest()
-                    #print(f'link = {link}\nnews id = {news_id}')
-                    if await self.db.is_news_exists(news_id):
-                        continue
+                    news_id = NewsDatabase.news_key(link)
                 
                     time_part = f" ({date_str})" if date_str else ""
                     news_item = f"{title}{time_part} <a href='{link}'>— РИА</a>"
-                    news.append(news_item)
-                    await self.db.add_news(news_id, 'ria', title, link)
+                    news.append((news_id, title, link, news_item))
                 
                 except Exception as e:
                     logger.warning(f"RIA item error: {str(e)[:100]}")
@@ -143,12 +146,15 @@ class RussianNewsParser:
     
         return news
         
-    async def parse_interfax(self):
+    async def parse_interfax(self, listings: list):
         """Парсинг новостей Interfax"""
         news = []
         try:
-            response = requests.get('https://www.interfax.ru/business/', timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            html, validators = await self.http.get_listing('https://www.interfax.ru/business/', marker='timeline__', timeout=10)
+            if html is None:
+                return news
+            listings.append(validators)
+            soup = BeautifulSoup(html, 'html.parser')
 
             # Обрабатываем все новостные блоки (обычные и фото)
             for item in soup.select('div.timeline__group > div, div.timeline__photo, div.timeline__text'):
@@ -168,13 +174,10 @@ class RussianNewsParser:
                     # Берем время из атрибута datetime или текста
                     time_text = time_elem.get('datetime', '').split('T')[1][:5] if time_elem.get('datetime') else time_elem.get_text(strip=True)
                     
-                    news_id = hashlib.md5(link.encode()).hexdigest()
-                    if await self.db.is_news_exists(news_id):
-                        continue
+                    news_id = NewsDatabase.news_key(link)
                     
                     news_item = f"{title} ({time_text}) <a href='{link}'>— Interfax</a>"
-                    news.append(news_item)
-                    await self.db.add_news(news_id, 'interfax', title, link)
+                    news.append((news_id, title, link, news_item))
                 except Exception as e:
                     logger.warning(f"Interfax item error: {str(e)[:100]}")
                     continue
@@ -184,16 +187,16 @@ class RussianNewsParser:
             logger.error(f"Interfax parse failed: {str(e)[:200]}")
             return []
 
-    async def parse_kommersant(self):
+    async def parse_kommersant(self, listings: list):
         """Парсинг новостей Коммерсантъ"""
         news = []
         try:
             logger.info("Starting Kommersant parser")
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get('https://www.kommersant.ru/rubric/3', headers=headers, timeout=15)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            html, validators = await self.http.get_listing('https://www.kommersant.ru/rubric/3', marker='rubric_lenta__item', timeout=15)
+            if html is None:
+                return news
+            listings.append(validators)
+            soup = BeautifulSoup(html, 'html.parser')
             
             # Основной селектор статей - охватывает все варианты
             articles = soup.select('article.rubric_lenta__item, article.uho, div.rubric_lenta__item')
@@ -244,15 +247,10 @@ class RussianNewsParser:
                             # Обработка относительных дат
                             date_text = datetime.now().strftime('%H:%M')
                     
-                    news_id = hashlib.md5(link.encode()).hexdigest()
-                    
-                    if await self.db.is_news_exists(news_id):
-                        logger.debug(f"Article already in DB: {title[:50]}...")
-                        continue
+                    news_id = NewsDatabase.news_key(link)
                     
                     news_item = f"{title} ({date_text}) <a href='{link}'>— Ъ</a>"
-                    news.append(news_item)
-                    await self.db.add_news(news_id, 'kommersant', title, link)
+                    news.append((news_id, title, link, news_item))
                     
                 except Exception as e:
                     logger.error(f"Error processing article: {str(e)}\nArticle snippet:\n{str(article)[:300]}...")
@@ -261,20 +259,16 @@ class RussianNewsParser:
         except Exception as e:
             logger.error(f"Kommersant parse failed: {str(e)}")
         
-        logger.info(f"Kommersant parser finished. Found {len(news)} new articles")
+        logger.info(f"Kommersant parser finished. Found {len(news)} articles")
         return news
 
-    async def parse_1prime(self):
+    async def parse_1prime(self, listings: list):
         """Парсинг новостей с 1prime.ru (ПРАЙМ)"""
         news = []
         try:
-            async with async_playwright() as pw:
-                browser = await pw.chromium.launch()
-                context = await browser.new_context(
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-                )
-                page = await context.new_page()
-                
+            async with self.browser.page(
+                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+            ) as page:
                 await page.goto('https://1prime.ru/simple_ROSSIJA+state_regulation/', timeout=60000)
                 
                 # Пытаемся закрыть дисклеймер
@@ -309,28 +303,21 @@ class RussianNewsParser:
                         link = "https://1prime.ru" + title_elem['href']
                         #print(f'link = {link}')
                         
-                        news_id = hashlib.md5(link.encode()).hexdigest()
-                        #print(f'link = {link}\nnews id = {news_id}')
-                        if await self.db.is_news_exists(news_id):
-                            continue
+                        news_id = NewsDatabase.news_key(link)
                             
                         news_item = f"{title} ({time}) <a href='{link}'>— ПРАЙМ</a>"
                         #print(news_item)
-                        news.append(news_item)
-                        #print(f'news = {news}')
-                        await self.db.add_news(news_id, '1prime', title, link)
+                        news.append((news_id, title, link, news_item))
                     except Exception as e:
                         logger.warning(f"Ошибка обработки новости 1prime: {str(e)[:100]}")
                         continue
-                
-                await browser.close()
         
         except Exception as e:
             logger.error(f"Ошибка парсинга 1prime: {str(e)[:200]}")
         return news
         #return news if news else ["ℹ️ Не удалось загрузить новости ПРАЙМ"]
 
-    async def parse_rb(self):
+    async def parse_rb(self, listings: list):
         """Парсинг новостей RB.RU (финансы, сделки, ВВП, бизнес)"""
         news = []
         base_url = "https://rb.ru"
@@ -342,13 +329,14 @@ class RussianNewsParser:
         ]
         
         try:
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            
             for section in sections:
                 try:
                     url = f"{base_url}{section}"
-                    response = requests.get(url, headers=headers, timeout=10)
-                    soup = BeautifulSoup(response.text, 'html.parser')
+                    html, validators = await self.http.get_listing(url, marker='news-item__title', timeout=10)
+                    if html is None:
+                        continue
+                    listings.append(validators)
+                    soup = BeautifulSoup(html, 'html.parser')
                     
                     news_blocks = soup.select('div.news-item')[:15]
                     
@@ -389,16 +377,12 @@ class RussianNewsParser:
                                 except Exception as e:
                                     logger.warning(f"Ошибка обработки даты RB.RU: {str(e)[:100]}")
                             
-                            news_id = hashlib.md5(link.encode()).hexdigest()
-                            #print(f'link = {link}\nnews id = {news_id}')
-                            if await self.db.is_news_exists(news_id):
-                                continue
+                            news_id = NewsDatabase.news_key(link)
                             
                             date_part = f" ({date_str})" if date_str else ""
                             source_link = f'<a href="{link}">— RB.RU</a>'
                             news_item = f"{title}{date_part} {source_link}"
-                            news.append(news_item)
-                            await self.db.add_news(news_id, 'rb', title, link)
+                            news.append((news_id, title, link, news_item))
                             
                         except Exception as e:
                             logger.warning(f"Ошибка обработки новости RB.RU: {str(e)[:100]}")
@@ -408,12 +392,12 @@ class RussianNewsParser:
                     logger.error(f"Ошибка парсинга RB.RU {section}: {str(e)[:200]}")
                     continue
             
-            # Удаляем дубликаты
+            # Удаляем дубликаты (одна новость может быть в нескольких разделах)
             seen = set()
             unique_news = []
             for item in news:
-                if item not in seen:
-                    seen.add(item)
+                if item[0] not in seen:
+                    seen.add(item[0])
                     unique_news.append(item)
             
             return unique_news[:30]
@@ -422,18 +406,20 @@ class RussianNewsParser:
             logger.error(f"Ошибка парсинга RB.RU: {str(e)[:200]}")
             return []
 
-    async def parse_iz(self):
+    async def parse_iz(self, listings: list):
         news = []
         base_url = "https://iz.ru"
         now = datetime.now()
         
         try:
-            headers = {'User-Agent': 'Mozilla/5.0...'}
-            
             for section in ['/rubric/ekonomika', '/tag/rubl', '/tag/neft', '/tag/dollar']:
                 url = f"{base_url}{section}"
-                response = requests.get(url, headers=headers, timeout=15)
-                soup = BeautifulSoup(response.text, 'html.parser')
+                marker = 'node__cart__item' if 'rubric/ekonomika' in url else 'tag-materials-item'
+                html, validators = await self.http.get_listing(url, marker=marker, timeout=15)
+                if html is None:
+                    continue
+                listings.append(validators)
+                soup = BeautifulSoup(html, 'html.parser')
                 
                 # Универсальный поиск новостных блоков
                 news_blocks = (
@@ -494,18 +480,12 @@ class RussianNewsParser:
                             else:
                                 date_str = f"{pub_date.strftime('%d.%m.%Y')} {time_part}" if time_part else pub_date.strftime('%d.%m.%Y')
                         
-                        news_id = hashlib.md5(link.encode()).hexdigest()
-                    
-                        if await self.db.is_news_exists(news_id):
-                            logger.debug(f"Article exists in DB: {title[:50]}...")
-                            continue
-                        
+                        news_id = NewsDatabase.news_key(link)
                         
                         # Формирование итоговой строки
                         time_part = f" ({date_str})" if date_str else ""
                         news_item = f"{title}{time_part} <a href='{link}'>— Известия</a>"
-                        news.append(news_item)
-                        await self.db.add_news(news_id, 'iz', title, link)
+                        news.append((news_id, title, link, news_item))
                         
                     except Exception as e:
                         logger.warning(f"Ошибка обработки новости: {str(e)[:200]}")
@@ -516,25 +496,26 @@ class RussianNewsParser:
         
         return news
 
-    async def parse_cbr(self):
+    async def parse_cbr(self, listings: list):
         """Парсинг новостей ЦБ РФ"""
         try:
-            feed = feedparser.parse("https://cbr.ru/rss/eventrss")
+            xml, validators = await self.http.get_listing("https://cbr.ru/rss/eventrss", marker='<item>')
+            if xml is None:
+                return []
+            listings.append(validators)
+            feed = feedparser.parse(xml)
             news = []
             for entry in feed.entries[:15]:  # Берем 5 последних новостей
                 try:
                     date = datetime.strptime(entry.published, '%a, %d %b %Y %H:%M:%S %z').strftime('%d.%m.%Y %H:%M')
-                    news_id = hashlib.md5(entry.link.encode()).hexdigest()
+                    news_id = NewsDatabase.news_key(entry.link)
                     #print(f'link = {entry.link}\nnews id = {news_id}')
                     #print(f'link = {entry.link}')
                     
-                    if await self.db.is_news_exists(news_id):
-                        continue
                     
                     source_link = f'<a href="{entry.link}">— ЦБ РФ</a>'
                     news_item = f"{entry.title} ({date}) {source_link}"
-                    news.append(news_item)
-                    await self.db.add_news(news_id, 'cbr', entry.title, entry.link)
+                    news.append((news_id, entry.title, entry.link, news_item))
                 except Exception as e:
                     logger.warning(f"Ошибка обработки новости ЦБ РФ: {str(e)[:100]}")
                     continue
@@ -544,13 +525,15 @@ class RussianNewsParser:
             logger.error(f"Ошибка парсинга ЦБ РФ: {str(e)[:200]}")
             return []
 
-    async def parse_rbc(self):
+    async def parse_rbc(self, listings: list):
         """Парсинг новостей РБК"""
         news = []
         try:
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            response = requests.get('https://www.rbc.ru/quote', headers=headers, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            html, validators = await self.http.get_listing('https://www.rbc.ru/quote', marker='q-item__wrap', timeout=10)
+            if html is None:
+                return news
+            listings.append(validators)
+            soup = BeautifulSoup(html, 'html.parser')
             
             news_blocks = soup.select('div.q-item__wrap')[:15]
             
@@ -591,16 +574,12 @@ class RussianNewsParser:
                             hours = int(''.join(filter(str.isdigit, time_text)))
                             date_str = (now - timedelta(hours=hours)).strftime('%d.%m.%Y %H:%M')
                     
-                    news_id = hashlib.md5(link.encode()).hexdigest()
-                    #print(f'link = {link}\nnews id = {news_id}')
-                    if await self.db.is_news_exists(news_id):
-                        continue
+                    news_id = NewsDatabase.news_key(link)
                     
                     date_part = f" ({date_str})" if date_str else ""
                     source_link = f'<a href="{link}">— РБК</a>'
                     news_item = f"{title}{date_part} {source_link}"
-                    news.append(news_item)
-                    await self.db.add_news(news_id, 'rbc', title, link)
+                    news.append((news_id, title, link, news_item))
                     
                 except Exception as e:
                     logger.warning(f"Ошибка обработки новости РБК: {str(e)[:100]}")
@@ -612,24 +591,77 @@ class RussianNewsParser:
             logger.error(f"Ошибка парсинга РБК: {str(e)[:200]}")
             return []
 
-    async def parse(self):
-        """Основной метод парсинга всех источников"""
-        all_news = []
-        for source_name, parser in self.sources.items():
+    async def _keep_new(self, source_name, rows):
+        """Отбирает еще не опубликованные новости.
+
+        rows - кортежи (news_id, title, link, news_item), которые возвращают парсеры источников.
+        Возвращает пары (строка для таблицы news, текст новости); в news строки попадают вместе
+        с отправкой дайджеста из outbox.
+        """
+        new_ids = await self.db.filter_new([row[0] for row in rows])
+        fresh = []
+        for news_id, title, link, news_item in rows:
+            if news_id in new_ids:
+                new_ids.discard(news_id)  # Повтор на той же странице не публикуем дважды
+                fresh.append((news_id, title, link, news_item))
+        return [((news_id, source_name, title, link), news_item) for news_id, title, link, news_item in fresh]
+
+    async def _run_source(self, source_name, parser):
+        """Запуск одного источника с ограничением параллелизма и собственным таймаутом.
+
+        Возвращает и валидаторы загруженных страниц-списков: их сохраняет parse() после постановки
+        дайджеста в outbox. Если источник не уложился в таймаут или упал, валидаторы отбрасываются,
+        и в следующем цикле его страницы разбираются заново.
+        """
+        async with self._sources_semaphore:
+            started = time.monotonic()
+            news = []
+            listings = []
             try:
-                news = await parser()
-                if isinstance(news, list):
-                    all_news.extend(news)
-                logger.info(f"Parsed {len(news)} news from {source_name}")
+                result = await asyncio.wait_for(parser(listings), timeout=Config.NEWS_SOURCE_TIMEOUT)
+                if isinstance(result, list) and result:
+                    news = await self._keep_new(source_name, result)
+            except asyncio.TimeoutError:
+                logger.error(f"Source {source_name} timed out after {Config.NEWS_SOURCE_TIMEOUT}s")
+                listings = []
             except Exception as e:
                 logger.error(f"Failed to parse {source_name}: {str(e)}")
+                listings = []
+            return source_name, news, listings, time.monotonic() - started
+
+    async def parse(self):
+        """Основной метод парсинга всех источников"""
+        started = time.monotonic()
+        results = {}
+        listings = []
+        tasks = [
+            asyncio.create_task(self._run_source(source_name, parser))
+            for source_name, parser in self.sources.items()
+        ]
+        for task in asyncio.as_completed(tasks):
+            source_name, news, source_listings, duration = await task
+            results[source_name] = news
+            listings.extend(source_listings)
+            logger.info(f"Parsed {len(news)} news from {source_name} in {duration:.1f}s")
+
+        # Сохраняем порядок источников, чтобы дайджест не зависел от скорости сайтов
+        fresh = [item for source_name in self.sources for item in results.get(source_name, [])]
+        all_news = [news_item for _, news_item in fresh]
+        logger.info(
+            f"News cycle: {len(all_news)} items from {len(self.sources)} sources "
+            f"in {time.monotonic() - started:.1f}s"
+        )
 
         if all_news:
             formatted = HTMLFormatter.format_news_with_priority(all_news)
-            await self.tg.safe_send(f"📌 <b>ЭКОНОМИЧЕСКИЕ НОВОСТИ</b>\n{formatted}", parse_mode='HTML',
-                content_type='news')
+            queued = await self.tg.safe_send(f"📌 <b>ЭКОНОМИЧЕСКИЕ НОВОСТИ</b>\n{formatted}", parse_mode='HTML',
+                content_type='news', news=[row for row, _ in fresh])
+            # Пока дайджест не в outbox, страницы считаются необработанными
+            if queued:
+                self.http.remember_listings(listings)
         else:
+            self.http.remember_listings(listings)
             await self.tg.safe_send("ℹ️ Нет новых экономических новостей",
-                content_type='news')
+                content_type='news', review_only=True)
 
         return bool(all_news)
\ No newline at end of file
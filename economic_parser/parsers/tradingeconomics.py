@@ -1,10 +1,11 @@
 import logging
-import hashlib
 import asyncio
-from pathlib import Path
-from playwright.async_api import async_playwright
+from typing import Optional
 from services.telegram_client import TelegramClient
+from services.browser_pool import BrowserPool
+from services.market_snapshots import MarketSnapshots
 from services.yandex_translator import YandexTranslator
+from utils.screenshoter import Screenshoter
 from database import NewsDatabase
 from aiogram import Bot, Dispatcher, F
 from database import NewsDatabase
@@ -12,32 +13,33 @@ from database import NewsDatabase
 logger = logging.getLogger(__name__)
 
 class TradingEconomicsParser:
-    def __init__(self, dp: Dispatcher, db: NewsDatabase):  # Добавляем параметр db
-        self.tg = TelegramClient(dp, db)  # Передаем оба параметра
+    def __init__(self, tg: TelegramClient, db: NewsDatabase, browser: BrowserPool, snapshots: MarketSnapshots):
+        self.tg = tg  # Общий клиент Telegram
+        self.browser = browser  # Общий пул Chromium
+        self.snapshots = snapshots  # Публикация разделов только при существенном изменении цен
         self.base_timeout = 45000  # 45 секунд для основных операций
         self.load_timeout = 90000  # 90 секунд для загрузки страницы
         self.db = db  # Сохраняем ссылку на БД для возможного будущего использования
         self.translator = YandexTranslator()
 
-    async def get_chart_screenshot(self, page, news_id: str):
-        """Скриншот графика с Trading Economics"""
+    async def get_chart_screenshot(self, page) -> Optional[bytes]:
+        """Скриншот графика с Trading Economics (в памяти, без записи на диск)"""
         try:
             chart = page.locator('//div[@id="UpdatePanelChart"]')
             if await chart.count() > 0:
-                path = f"te_chart_{news_id}.png"
-                await chart.screenshot(path=path)
-                return path
+                return await Screenshoter.capture(chart)
         except Exception as e:
             logger.warning(f"Chart screenshot failed: {str(e)[:100]}")
         return None
 
     async def parse_commodities_table(self, page):
-        """Парсинг таблицы товарных активов (только топ-5)"""
+        """Парсинг таблицы товарных активов (только топ-5); возвращает строки и записи снимка"""
         try:
             await page.wait_for_selector('.table.table-hover', timeout=30000)
             rows = await page.query_selector_all('table.table-hover tbody tr')
             
             commodities_data = []
+            records = []
             for row in rows[:5]:  # Берем только топ-5
                 try:
                     # Получаем элементы
@@ -99,14 +101,15 @@ class TradingEconomicsParser:
                         logger.warning(f"Не удалось получить стиль изменения: {str(e)[:100]}")
                     
                     commodities_data.append(f"{emoji} {name}: {price} ({change}) | {date}")
+                    records.append(MarketSnapshots.record(name, price, change, date, source='tradingeconomics'))
                 except Exception as e:
                     logger.warning(f"Ошибка парсинга строки: {str(e)[:100]}")
                     continue
             
-            return commodities_data
+            return commodities_data, records
         except Exception as e:
             logger.error(f"Ошибка парсинга таблицы товаров: {str(e)[:200]}")
-            return []
+            return [], []
 
     async def parse_crypto(self, page):
         """Парсинг криптовалют с исправленными селекторами"""
@@ -118,6 +121,7 @@ class TradingEconomicsParser:
         
             rows = await page.query_selector_all('table.table-hover tbody tr')
             crypto_data = []
+            records = []
         
             for row in rows[:10]:  # Берем топ-10
                 try:
@@ -139,47 +143,62 @@ class TradingEconomicsParser:
                     # Определение цвета
                     emoji = "🔴" if change.startswith('-') else "🟢" if change.startswith('+') else "⚪"
                     crypto_data.append(f"{emoji} {name}: {price} ({change} | {date_elem})")
+                    records.append(MarketSnapshots.record(name, price, change, date_elem, source='tradingeconomics'))
                 except Exception as e:
                     logger.warning(f"Crypto row error: {str(e)[:100]}")
                     continue
         
             if crypto_data:
+                if not await self.snapshots.update('crypto', records):
+                    return
                 await self.tg.safe_send("💰 <b>Топ-10 криптовалют:</b>\n" + "\n".join(crypto_data),
     content_type='crypto')
             else:
                 await self.tg.safe_send("ℹ️ Данные по криптовалютам временно недоступны",
-    content_type='crypto')
+    content_type='crypto', review_only=True)
             
         except Exception as e:
             logger.error(f"Crypto parse failed: {str(e)}")
             await self.tg.safe_send("⚠️ Ошибка получения данных по криптовалютам",
-    content_type='crypto')
+    content_type='crypto', review_only=True)
 
-    async def parse_news(self, page):
+    async def parse_news(self, context):
         """Парсинг новостей с переводом"""
         try:
-            await page.goto('https://tradingeconomics.com/stream', timeout=60000)
-            await page.wait_for_selector('.te-stream-item', timeout=30000)
-            
-            news_items = await page.query_selector_all('.te-stream-item')
-            for item in news_items[:15]:
-                try:
-                    title_elem = await item.query_selector('.te-stream-title')
-                    if not title_elem:
-                        continue
-                    
-                    title = await title_elem.inner_text()
-                    link = await title_elem.get_attribute('href')
-                    if not link.startswith('http'):
-                        link = f"https://tradingeconomics.com{link}"
-                    
-                    news_id = hashlib.md5(link.encode()).hexdigest()
-                    if await self.db.is_news_exists(news_id):
+            # Сначала собираем ленту и закрываем ее страницу: страницы новостей берут свои слоты пула
+            candidates = []
+            async with self.browser.page(context) as page:
+                await page.goto('https://tradingeconomics.com/stream', timeout=60000)
+                await page.wait_for_selector('.te-stream-item', timeout=30000)
+
+                news_items = await page.query_selector_all('.te-stream-item')
+                for item in news_items[:15]:
+                    try:
+                        title_elem = await item.query_selector('.te-stream-title')
+                        if not title_elem:
+                            continue
+
+                        title = await title_elem.inner_text()
+                        link = await title_elem.get_attribute('href')
+                        if not link.startswith('http'):
+                            link = f"https://tradingeconomics.com{link}"
+
+                        text_elem = await item.query_selector('.te-stream-item-description')
+                        text = await text_elem.inner_text() if text_elem else ""
+
+                        news_id = NewsDatabase.news_key(link)
+                        candidates.append((news_id, title, link, text))
+                    except Exception as e:
+                        logger.warning(f"News item error: {str(e)[:100]}")
                         continue
-                    
-                    text_elem = await item.query_selector('.te-stream-item-description')
-                    text = await text_elem.inner_text() if text_elem else ""
-                    
+
+            # Ссылки со всей ленты проверяются в БД одним запросом
+            new_ids = await self.db.filter_new([candidate[0] for candidate in candidates])
+            for news_id, title, link, text in candidates:
+                if news_id not in new_ids:
+                    continue
+                new_ids.discard(news_id)
+                try:
                     # Пробуем перевод, если не получится - отправляем оригинал
                     try:
                         translated = await self.translator.translate(f"{title}\n{text}")
@@ -189,22 +208,17 @@ class TradingEconomicsParser:
                         logger.warning(f"Translation failed: {str(e)[:100]}")
                         translated = f"{title}\n{text}"
                     
-                    chart_path = None
+                    chart = None
                     try:
-                        news_page = await page.context.new_page()
-                        await news_page.goto(link, timeout=60000)
-                        chart_path = await self.get_chart_screenshot(news_page, news_id)
-                        await news_page.close()
+                        async with self.browser.page(context) as news_page:
+                            await news_page.goto(link, timeout=60000)
+                            chart = await self.get_chart_screenshot(news_page)
                     except Exception as e:
                         logger.warning(f"News page error: {str(e)[:100]}")
                     
                     if translated:
-                        await self.tg.safe_send(translated, image_path=chart_path,
-                content_type='news')
-                        await self.db.add_news(news_id, 'tradingeconomics', title, link)
-                    
-                    if chart_path and Path(chart_path).exists():
-                        Path(chart_path).unlink()
+                        await self.tg.safe_send(translated, image=chart,
+                content_type='news', news=[(news_id, 'tradingeconomics', title, link)])
                         
                 except Exception as e:
                     logger.warning(f"News item error: {str(e)[:100]}")
@@ -214,28 +228,25 @@ class TradingEconomicsParser:
 
     async def parse(self):
         """Основной метод парсинга"""
-        async with async_playwright() as pw:
-            browser = await pw.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                viewport={'width': 1200, 'height': 800}
-            )
-            page = await context.new_page()
-            
+        # Один контекст на обход: страницы таблиц, ленты и новостей делят cookies и кэш
+        async with self.browser.context(
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            viewport={'width': 1200, 'height': 800}
+        ) as context:
             try:
-                # Парсинг товарных активов
-                await page.goto('https://tradingeconomics.com/commodities', timeout=60000)
-                commodities = await self.parse_commodities_table(page)
-                if commodities:
-                    await self.tg.safe_send("🛢️ <b>Товарные активы:</b>\n" + "\n".join(commodities),
+                async with self.browser.page(context) as page:
+                    # Парсинг товарных активов
+                    await page.goto('https://tradingeconomics.com/commodities', timeout=60000)
+                    commodities, records = await self.parse_commodities_table(page)
+                    if commodities and await self.snapshots.update('commodities', records):
+                        await self.tg.safe_send("🛢️ <b>Товарные активы:</b>\n" + "\n".join(commodities),
     content_type='commodities')
-                
-                # Остальные парсеры
-                await self.parse_crypto(page)
-                await self.parse_news(page)
+                    
+                    await self.parse_crypto(page)
+
+                # Лента открывает свои страницы, поэтому запускается после освобождения страницы таблиц
+                await self.parse_news(context)
                 return True
             except Exception as e:
                 logger.error(f"TE parsing failed: {str(e)}")
-                return False
-            finally:
-                await browser.close()
\ No newline at end of file
+                return False
\ No newline at end of file
@@ -0,0 +1,54 @@
+import hashlib
+import logging
+from typing import Optional, Dict
+from database import NewsDatabase
+
+logger = logging.getLogger(__name__)
+
+class ListingCache:
+    """Валидаторы HTTP (ETag/Last-Modified) и хэши списков новостей по URL"""
+
+    def __init__(self, db: NewsDatabase):
+        self.db = db
+        # Читается один раз при создании, до запуска event loop: дальше обращения идут только к памяти
+        self._entries: Dict[str, Dict] = db.get_listing_cache()
+        logger.info(f"Loaded listing cache for {len(self._entries)} URLs")
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """Заголовки условного запроса для ранее загруженной страницы"""
+        entry = self._entries.get(url, {})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @staticmethod
+    def digest(text: str, marker: str = None) -> str:
+        """Хэш значимой части страницы.
+
+        marker - подстрока (обычно CSS-класс элемента списка): хэшируется текст от первого
+        до последнего ее вхождения, чтобы шапка, реклама и счетчики не влияли на результат.
+        """
+        if marker:
+            start = text.find(marker)
+            if start != -1:
+                text = text[start:text.rfind(marker) + len(marker)]
+        return hashlib.blake2b(text.encode('utf-8', 'replace'), digest_size=16).hexdigest()
+
+    def is_unchanged(self, url: str, content_hash: str) -> bool:
+        return self._entries.get(url, {}).get('content_hash') == content_hash
+
+    def remember(self, url: str, content_hash: str = None, etag: str = None, last_modified: str = None):
+        """Сохраняет новое состояние страницы в памяти и в БД"""
+        entry = self._entries.setdefault(url, {})
+        entry.update({
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': content_hash or entry.get('content_hash')
+        })
+        try:
+            self.db.save_listing_cache(url, entry['etag'], entry['last_modified'], entry['content_hash'])
+        except Exception as e:
+            logger.warning(f"Listing cache save failed for {url}: {str(e)[:100]}")
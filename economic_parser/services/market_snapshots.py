@@ -0,0 +1,96 @@
+import logging
+import re
+from typing import Optional, Dict, List
+from config import Config
+from database import NewsDatabase
+
+logger = logging.getLogger(__name__)
+
+# Разделы, где время записи - часть данных (дата выплаты дивиденда), а не момент котировки
+DATED_SECTIONS = {'dividends'}
+
+
+class MarketSnapshots:
+    """Последние снимки рыночных разделов (stocks, dividends, commodities, crypto).
+
+    Парсер передает типизированные записи раздела; каждый снимок сохраняется в market_snapshots
+    (временной ряд), а раздел публикуется, только если он существенно отличается от последнего
+    опубликованного - так накопившиеся мелкие движения тоже приводят к публикации.
+    """
+
+    def __init__(self, db: NewsDatabase):
+        self.db = db
+        self._published: Dict[str, List[Dict]] = {}  # Последний опубликованный снимок, читается из БД один раз
+
+    @staticmethod
+    def parse_number(text: Optional[str]) -> Optional[float]:
+        """Число из строки сайта: "$67,123.45", "2 876,4", "+1.25%", "−0,8"; None, если числа нет"""
+        if not text:
+            return None
+        text = text.replace('\xa0', '').replace(' ', '').replace('−', '-')
+        match = re.search(r'[-+]?\d[\d.,]*', text)
+        if not match:
+            return None
+        number = match.group().rstrip('.,')
+        if ',' in number and '.' in number:
+            # Последний из разделителей - десятичный
+            thousands = ',' if number.rfind('.') > number.rfind(',') else '.'
+            number = number.replace(thousands, '').replace(',', '.')
+        elif ',' in number:
+            groups = number.lstrip('+-').split(',')
+            # "67,123" и "1,234,567" - разделители тысяч, "2876,4" и "0,125" - десятичная запятая
+            if 0 < len(groups[0].lstrip('0')) <= 3 and all(len(group) == 3 for group in groups[1:]):
+                number = number.replace(',', '')
+            else:
+                number = number.replace(',', '.')
+        try:
+            return float(number)
+        except ValueError:
+            return None
+
+    @classmethod
+    def record(cls, ticker: str, price: str, change: str = None, quote_time: str = None, source: str = None) -> Dict:
+        """Типизированная запись снимка из текстовых значений со страницы"""
+        return {
+            'ticker': ticker.strip(),
+            'price': cls.parse_number(price),
+            'change': cls.parse_number(change),
+            'quote_time': quote_time.strip() if quote_time else None,
+            'source': source
+        }
+
+    @staticmethod
+    def _is_material(section: str, previous: List[Dict], records: List[Dict]) -> bool:
+        """Изменился ли состав раздела или цена хотя бы одной записи на SNAPSHOT_MIN_CHANGE %"""
+        previous_by_ticker = {record['ticker']: record for record in previous}
+        if set(previous_by_ticker) != {record['ticker'] for record in records}:
+            return True
+        for record in records:
+            old = previous_by_ticker[record['ticker']]
+            if section in DATED_SECTIONS and old['quote_time'] != record['quote_time']:
+                return True
+            if old['price'] is None or record['price'] is None:
+                if old['price'] != record['price']:
+                    return True
+                continue
+            base = abs(old['price']) or 1
+            if abs(record['price'] - old['price']) / base * 100 >= Config.SNAPSHOT_MIN_CHANGE:
+                return True
+        return False
+
+    async def update(self, section: str, records: List[Dict]) -> bool:
+        """Сохраняет снимок и сравнивает его с последним опубликованным; True - раздел нужно опубликовать.
+
+        Пустой снимок (данные не получены) всегда считается изменившимся и не сохраняется.
+        """
+        if not records:
+            return True
+        if section not in self._published:
+            self._published[section] = await self.db.get_last_published_snapshot(section)
+        material = self._is_material(section, self._published[section], records)
+        await self.db.save_market_snapshot(section, records, published=material)
+        if not material:
+            logger.info(f"Section {section} has not changed materially, skipping publish")
+            return False
+        self._published[section] = records
+        return True
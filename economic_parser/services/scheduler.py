@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class CronSchedule:
+    """Минимальный разбор cron-выражения "минута час день месяц день_недели".
+
+    Поддерживаются *, списки через запятую, диапазоны a-b и шаг /n. День недели: 0 или 7 - воскресенье.
+    """
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = [
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELD_RANGES)
+        ]
+        self.weekdays = {day % 7 for day in weekdays}
+        # Как в cron: если ограничены и день месяца, и день недели, подходит любой из них
+        self._days_restricted = fields[2] != '*'
+        self._weekdays_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for part in field.split(','):
+            value_range, _, step = part.partition('/')
+            if value_range == '*':
+                start, end = low, high
+            elif '-' in value_range:
+                start, end = (int(v) for v in value_range.split('-'))
+            else:
+                start = int(value_range)
+                end = high if step else start
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron field {field!r} out of range {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Ближайший момент строго после moment, подходящий под выражение"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+
+class Scheduler:
+    """Запускает задачи по собственному расписанию каждой.
+
+    Расписание - интервал в секундах или cron-выражение. К каждому запуску добавляется
+    случайная задержка до jitter секунд; запуск пропускается, если предыдущий еще идет.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict] = {}
+        self._loops = []
+
+    def add(self, name: str, func: Callable[[], Awaitable], schedule: str, jitter: float = 0, run_at_start: bool = True):
+        """Регистрирует задачу; schedule - "1800" (секунды) или "*/5 10-18 * * 1-5" (cron)"""
+        schedule = str(schedule).strip()
+        self.jobs[name] = {
+            'func': func,
+            'interval': int(schedule) if schedule.isdigit() else None,
+            'cron': None if schedule.isdigit() else CronSchedule(schedule),
+            'jitter': jitter,
+            'run_at_start': run_at_start,
+            'task': None,
+            'last_started': None,
+            'last_duration': None
+        }
+        logger.info(f"Scheduled {name}: {schedule} (jitter {jitter}s)")
+
+    def _next_delay(self, job: Dict) -> float:
+        if job['cron'] is not None:
+            now = datetime.now()
+            delay = (job['cron'].next_after(now) - now).total_seconds()
+        else:
+            delay = job['interval']
+        return delay + random.uniform(0, job['jitter'])
+
+    def is_running(self, name: str) -> bool:
+        task = self.jobs[name]['task']
+        return task is not None and not task.done()
+
+    def trigger(self, name: str) -> bool:
+        """Внеочередной запуск задачи; False, если она уже выполняется"""
+        job = self.jobs[name]
+        if self.is_running(name):
+            logger.info(f"Job {name} is still running, skipping this run")
+            return False
+        job['task'] = asyncio.create_task(self._run(name, job))
+        return True
+
+    async def _run(self, name: str, job: Dict):
+        started = time.monotonic()
+        job['last_started'] = datetime.now()
+        try:
+            await job['func']()
+        except Exception as e:
+            logger.error(f"Job {name} failed: {e}", exc_info=True)
+        finally:
+            job['last_duration'] = time.monotonic() - started
+            logger.info(f"Job {name} finished in {job['last_duration']:.1f}s")
+
+    async def _job_loop(self, name: str, job: Dict):
+        if job['run_at_start']:
+            # Разносим стартовые запуски, чтобы парсеры не открывали браузер одновременно
+            await asyncio.sleep(random.uniform(0, job['jitter']))
+            self.trigger(name)
+        while True:
+            await asyncio.sleep(self._next_delay(job))
+            self.trigger(name)
+
+    def start(self):
+        for name, job in self.jobs.items():
+            self._loops.append(asyncio.create_task(self._job_loop(name, job)))
+
+    async def stop(self):
+        """Останавливает расписание и прерывает выполняющиеся задачи"""
+        tasks = self._loops + [job['task'] for job in self.jobs.values() if job['task'] is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loops.clear()
+
+    def status(self) -> Dict[str, Optional[str]]:
+        """Краткое состояние задач для команды /run без аргументов"""
+        result = {}
+        for name, job in self.jobs.items():
+            if self.is_running(name):
+                result[name] = 'выполняется'
+            elif job['last_started'] is not None:
+                result[name] = f"{job['last_started']:%H:%M}, {job['last_duration']:.0f}с"
+            else:
+                result[name] = None
+        return result
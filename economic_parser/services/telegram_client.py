@@ -1,24 +1,47 @@
 from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import Command, CommandObject
+from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError, TelegramRetryAfter
 from aiogram.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
-    FSInputFile,
+    BufferedInputFile,
     CallbackQuery,
+    InputMediaPhoto,
     Message
 )
 from pathlib import Path
 from config import Config
+import html
 import logging
 import re
 from datetime import datetime, date
 import asyncio
+import hashlib
+import random
+import time
+from collections import OrderedDict
 from database import NewsDatabase
+from services.metrics import ApiMetricsMiddleware, Metrics
+from services.rate_limiter import TokenBucket
+from utils.html_formatter import HTMLFormatter, MAX_MESSAGE_LENGTH, MAX_CAPTION_LENGTH
 
 logger = logging.getLogger(__name__)
 
+# Методы, публикующие сообщения в чат: только они расходуют лимит отправки чата.
+# Удаление, правка и ответы на нажатия идут лишь через общий лимит бота
+SEND_METHODS = {'send_message', 'send_photo', 'send_media_group', 'copy_message', 'copy_messages'}
+
 class TelegramClient:
     def __init__(self, dp: Dispatcher, db: NewsDatabase):
-        self.bot = Bot(token=Config.TELEGRAM_TOKEN)
+        session = None
+        if Config.TELEGRAM_API_SERVER:
+            session = AiohttpSession(api=TelegramAPIServer.from_base(Config.TELEGRAM_API_SERVER))
+        self.bot = Bot(token=Config.TELEGRAM_TOKEN, session=session)
+        # Задержки, ошибки и размеры запросов по каждому методу Bot API и обработчику кнопок
+        self.metrics = Metrics()
+        self.bot.session.middleware(ApiMetricsMiddleware(self.metrics))
         self._dp = dp
         self.db = db
         
@@ -32,9 +55,251 @@ class TelegramClient:
         }
         
         self.current_date = date.today()
+
+        # Исходящие вызовы Bot API: общий лимит бота и отдельный на каждый чат
+        self._global_bucket = TokenBucket(Config.TELEGRAM_GLOBAL_RATE, Config.TELEGRAM_GLOBAL_RATE)
+        self._chat_buckets = {}
+        # Отправка через outbox в БД: парсеры ставят сообщение и продолжают работу.
+        # У каждого чата своя очередь-отправитель, медленный канал не задерживает остальные
+        self._lanes = {}  # {chat_id: {'task': ..., 'wakeup': asyncio.Event}}
+        self._outbox_waiters = {}  # {id в outbox: future} для safe_send(wait=True)
+        self._stopping = False
+
+        # Отложенная правка закрепа: нажатия за PINNED_EDIT_WINDOW объединяются в одну
+        self._pinned_flush_task = None
+        self._pinned_lock = asyncio.Lock()
+        self._pinned_hash = None  # Хэш последнего отправленного текста закрепа
+
+        # file_id уже загруженных фото по хэшу содержимого: повтор отправляется ссылкой
+        self._photo_file_ids = OrderedDict()
+
         self._register_handlers()
         logger.info(f"Initialized with pinned message: {self.pinned_message_id}")
 
+    async def close(self, timeout: float = 30):
+        """Дает отправителю закончить текущее сообщение и закрывает HTTP-сессию бота.
+
+        Неотправленное остается в outbox и уйдет после перезапуска.
+        """
+        self._stopping = True
+        for lane in self._lanes.values():
+            lane['wakeup'].set()
+        tasks = [lane['task'] for lane in self._lanes.values()]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            if pending:
+                logger.warning(f"{len(pending)} outbox senders did not stop in time")
+        await self.bot.session.close()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        if key not in self._chat_buckets:
+            if key.startswith('-'):  # Группы и каналы
+                self._chat_buckets[key] = TokenBucket(Config.TELEGRAM_GROUP_RATE, Config.TELEGRAM_GROUP_BURST)
+            else:
+                self._chat_buckets[key] = TokenBucket(Config.TELEGRAM_PRIVATE_CHAT_RATE)
+        return self._chat_buckets[key]
+
+    async def _api(self, method, chat_id, **kwargs):
+        """Вызов метода Bot API с учетом лимитов, RetryAfter и повторами при сетевых ошибках"""
+        attempt = 0
+        while True:
+            await self._global_bucket.acquire()
+            if method.__name__ in SEND_METHODS:
+                await self._chat_bucket(chat_id).acquire()
+            try:
+                return await method(chat_id=chat_id, **kwargs)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > Config.TELEGRAM_SEND_RETRIES:
+                    raise
+                # Telegram сообщает точное время ожидания - ждем ровно его
+                logger.warning(f"Flood control on {method.__name__}: retry after {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except TelegramNetworkError as e:
+                attempt += 1
+                if attempt > Config.TELEGRAM_SEND_RETRIES:
+                    raise
+                delay = Config.TELEGRAM_BACKOFF_BASE * 2 ** (attempt - 1) * random.uniform(1, 1.5)
+                logger.warning(f"Network error on {method.__name__}: {e}, retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def start_sender(self):
+        """Запускает отправителей для чатов, где остались сообщения с прошлого запуска"""
+        self._stopping = False
+        for chat_id in await self.db.outbox_pending_chats():
+            self._wake_lane(chat_id)
+
+    def _wake_lane(self, chat_id: str):
+        """Будит отправителя чата, при необходимости запуская его"""
+        lane = self._lanes.get(chat_id)
+        if lane is None or lane['task'].done():
+            lane = {'wakeup': asyncio.Event()}
+            lane['task'] = asyncio.create_task(self._sender_loop(chat_id, lane['wakeup']))
+            self._lanes[chat_id] = lane
+        lane['wakeup'].set()
+
+    async def _sender_loop(self, chat_id: str, wakeup: asyncio.Event):
+        """Отправитель одного чата: его сообщения уходят в порядке постановки в outbox"""
+        while not self._stopping:
+            # Сбрасываем до чтения, чтобы не пропустить сообщение, поставленное во время отправки
+            wakeup.clear()
+            try:
+                due = await self.db.outbox_due(chat_id, Config.OUTBOX_BATCH)
+                rows = due
+                next_attempt_at = None
+                while rows and not self._stopping:
+                    album = self._album_run(rows)
+                    hold_until = self._album_hold_until(album, rows)
+                    if hold_until:
+                        # Новость с фото немного ждет соседей, чтобы уйти одним альбомом
+                        next_attempt_at = hold_until
+                        break
+                    if len(album) > 1:
+                        settled = await self._deliver_album(album)
+                    else:
+                        album = rows[:1]
+                        settled = await self._deliver(rows[0])
+                    if not settled:
+                        # Следующие сообщения ждут повтора этого, чтобы не обогнать его в чате
+                        break
+                    rows = rows[len(album):]
+                if self._stopping:
+                    return
+                if next_attempt_at is None:
+                    if due:
+                        continue
+                    next_attempt_at = await self.db.outbox_next_attempt_at(chat_id)
+            except Exception as e:
+                logger.error(f"Outbox error for chat {chat_id}: {e}", exc_info=True)
+                next_attempt_at = time.time() + Config.OUTBOX_RETRY_BASE
+
+            timeout = max(next_attempt_at - time.time(), 0) if next_attempt_at else None
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, row: dict) -> bool:
+        """Отправляет сообщение из outbox; новости помечаются только после ответа Telegram.
+
+        Повтор многочастного сообщения продолжается с первой части, которую Telegram еще не принял.
+        Возвращает False, если сообщение отложено до повтора и очередь чата должна его ждать.
+        """
+        message_ids = list(row['message_ids'])
+        try:
+            await self._send_with_controls(
+                row['text'], row['image'], row['content_type'], row['parse_mode'], chat_id=row['chat_id'],
+                sent=message_ids
+            )
+        except Exception as e:
+            return await self._mark_failed(row, e, message_ids)
+
+        await self.db.outbox_mark_sent(row['id'], message_ids, row['news'])
+        self._resolve_waiter(row['id'], True)
+        return True
+
+    async def _mark_failed(self, row: dict, error: Exception, message_ids: list = None) -> bool:
+        """Откладывает повтор или снимает сообщение с отправки; True, если сообщение снято"""
+        attempts = row['attempts'] + 1
+        # Ошибку в самом запросе (например, в разметке) повтор не исправит
+        final = attempts >= Config.OUTBOX_MAX_ATTEMPTS or isinstance(error, TelegramBadRequest)
+        delay = Config.OUTBOX_RETRY_BASE * 2 ** (attempts - 1)
+        await self.db.outbox_mark_failed(
+            row['id'], str(error)[:500], attempts, time.time() + delay, final, row['news'], message_ids
+        )
+        if final:
+            logger.error(f"Outbox message {row['id']} dropped after {attempts} attempts: {error}")
+            self._resolve_waiter(row['id'], False)
+        else:
+            logger.warning(f"Outbox message {row['id']} failed ({error}), retry in {delay:.0f}s")
+        return final
+
+    def _fits_album(self, row: dict) -> bool:
+        """Новость с фото, подпись которой целиком помещается в подпись элемента альбома"""
+        return (
+            bool(row['image'])
+            and row['content_type'] == 'news'
+            and HTMLFormatter.visible_length(row['text'], row['parse_mode'] == 'HTML') <= MAX_CAPTION_LENGTH
+        )
+
+    def _album_run(self, rows: list) -> list:
+        """Подряд идущие с начала очереди новости с фото в тот же чат, не больше ALBUM_SIZE"""
+        album = []
+        for row in rows[:Config.ALBUM_SIZE]:
+            if not self._fits_album(row) or row['chat_id'] != rows[0]['chat_id']:
+                break
+            album.append(row)
+        return album
+
+    def _album_hold_until(self, album: list, rows: list) -> float:
+        """До какого момента ждать пополнения неполного альбома; 0 - отправлять сейчас.
+
+        Ждем, только если за альбомом в очереди ничего нет и его первая новость еще не ждала
+        ALBUM_WAIT; повторные попытки не задерживаются.
+        """
+        if not album or len(album) >= Config.ALBUM_SIZE or len(album) < len(rows) or album[0]['attempts']:
+            return 0
+        hold_until = (album[0]['queued_at'] or 0) + Config.ALBUM_WAIT
+        return hold_until if hold_until > time.time() else 0
+
+    async def _deliver_album(self, rows: list) -> bool:
+        """Отправляет несколько новостей с фото одним альбомом и управляющим сообщением с кнопками.
+
+        Возвращает False, как и _deliver, если очередь чата должна ждать повтора.
+        """
+        chat_id = rows[0]['chat_id']
+        try:
+            media = [
+                InputMediaPhoto(media=self._photo_media(row['image']), caption=row['text'], parse_mode=row['parse_mode'])
+                for row in rows
+            ]
+            messages = await self._api(self.bot.send_media_group, chat_id, media=media)
+            for row, message in zip(rows, messages):
+                self._remember_photo(row['image'], message)
+        except Exception as e:
+            if isinstance(e, TelegramBadRequest):
+                # Альбом целиком отклонен (например, из-за file_id) - отправляем новости по одной
+                logger.warning(f"Album of {len(rows)} rejected: {e}, sending items separately")
+                for row in rows:
+                    if not await self._deliver(row):
+                        return False
+                return True
+            settled = [await self._mark_failed(row, e) for row in rows]
+            return all(settled)
+
+        logger.info(f"Sent album of {len(rows)} news to {chat_id}")
+        message_ids = [message.message_id for message in messages]
+        control_id = None
+        # Кнопки модерации - только в чате модерации, каналы получают чистый альбом
+        try:
+            if str(chat_id) == str(Config.TELEGRAM_CHAT_ID):
+                control = await self._api(
+                    self.bot.send_message,
+                    chat_id,
+                    text=f"🖼 Новостей в альбоме: {len(rows)}",
+                    reply_to_message_id=message_ids[0],
+                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                        InlineKeyboardButton(text="📌 Переслать в канал", callback_data="forward_album"),
+                        InlineKeyboardButton(text="🗑 Удалить", callback_data="delete_album")
+                    ]])
+                )
+                control_id = control.message_id
+        except Exception as e:
+            # Альбом уже доставлен - повторять его из-за кнопок нельзя
+            logger.error(f"Album control message failed: {e}")
+
+        for row, message_id in zip(rows, message_ids):
+            ids = [message_id, control_id] if control_id else [message_id]
+            await self.db.outbox_mark_sent(row['id'], ids, row['news'])
+            self._resolve_waiter(row['id'], True)
+        return True
+
+    def _resolve_waiter(self, outbox_id: int, result: bool):
+        future = self._outbox_waiters.pop(outbox_id, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
     def _extract_content(self, message: Message) -> str:
         """Извлекаем контент, сохраняя ВСЕ эмодзи-индикаторы"""
         return message.caption if message.caption else message.text or ""
@@ -74,12 +339,29 @@ class TelegramClient:
     
         return '\n'.join(lines)
 
+    async def _time_handler(self, handler, event, data):
+        """Middleware обработчиков кнопок: полное время от получения нажатия до выхода из обработчика"""
+        started = time.monotonic()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_object = data.get('handler')
+            name = handler_object.callback.__name__ if handler_object else 'unknown'
+            self.metrics.observe(f"handler.{name}", time.monotonic() - started)
+
     def _register_handlers(self):
         """Регистрация обработчиков с защитой от ошибок"""
+        self._dp.callback_query.middleware(self._time_handler)
+        self._dp.message.register(self._search_command, Command('search'))
+
         @self._dp.callback_query(F.data == 'delete_message')
         async def delete_handler(callback: CallbackQuery):
             try:
-                await callback.message.delete()
+                await self._api(
+                    self.bot.delete_messages,
+                    callback.message.chat.id,
+                    message_ids=await self._linked_message_ids(callback.message)
+                )
                 await callback.answer("Сообщение удалено")
             except Exception as e:
                 logger.error(f"Delete error: {e}")
@@ -94,72 +376,182 @@ class TelegramClient:
                     await callback.answer("Неизвестный тип контента", show_alert=True)
                     return
 
-                await self._process_pinned_update(callback, content_type)
-                await callback.answer("Закреп обновлён")
+                # Отвечаем сразу, правка закрепа выполняется в фоне
+                await callback.answer("Закреп обновится")
+                self._process_pinned_update(content_type, await self._pinned_content(callback.message, content_type))
             except Exception as e:
                 logger.error(f"Pin update error: {e}", exc_info=True)
-                await callback.answer("Ошибка при обновлении", show_alert=True)
                 
         @self._dp.callback_query(F.data == 'forward_to_channel')
         async def forward_handler(callback: CallbackQuery):
             try:
-                # Пересылаем сообщение в основной канал
-                await self.bot.copy_message(
-                    chat_id=Config.TARGET_CHANNEL_ID,
+                # Пересылаем в основной канал сообщение целиком, со всеми частями
+                await self._api(
+                    self.bot.copy_messages,
+                    Config.TARGET_CHANNEL_ID,
                     from_chat_id=callback.message.chat.id,
-                    message_id=callback.message.message_id
+                    message_ids=await self._linked_message_ids(callback.message)
                 )
                 await callback.answer("Новость переслана в канал")
             except Exception as e:
                 logger.error(f"Forward error: {e}")
                 await callback.answer("Ошибка при пересылке", show_alert=True)
-                
+
+        @self._dp.callback_query(F.data == 'forward_album')
+        async def forward_album_handler(callback: CallbackQuery):
+            try:
+                message_ids = [
+                    message_id for message_id in await self._linked_message_ids(callback.message)
+                    if message_id != callback.message.message_id
+                ]
+                if not message_ids:
+                    await callback.answer("Альбом не найден", show_alert=True)
+                    return
+                # copyMessages сохраняет группировку в альбом
+                await self._api(
+                    self.bot.copy_messages,
+                    Config.TARGET_CHANNEL_ID,
+                    from_chat_id=callback.message.chat.id,
+                    message_ids=message_ids
+                )
+                await callback.answer("Альбом переслан в канал")
+            except Exception as e:
+                logger.error(f"Album forward error: {e}")
+                await callback.answer("Ошибка при пересылке", show_alert=True)
+
+        @self._dp.callback_query(F.data == 'delete_album')
+        async def delete_album_handler(callback: CallbackQuery):
+            try:
+                await self._api(
+                    self.bot.delete_messages,
+                    callback.message.chat.id,
+                    message_ids=await self._linked_message_ids(callback.message)
+                )
+                await callback.answer("Альбом удален")
+            except Exception as e:
+                logger.error(f"Album delete error: {e}")
+                await callback.answer("Ошибка при удалении", show_alert=True)
+
+    async def _linked_message_ids(self, message: Message) -> list:
+        """ID сообщений, отправленных вместе с сообщением с кнопками (части длинного текста,
+        фото с продолжением подписи, альбом), по возрастанию; для сообщения не из outbox - только оно само"""
+        message_ids = {message.message_id}
+        for row in await self.db.outbox_sent_by_message(message.chat.id, message.message_id):
+            message_ids.update(row['message_ids'])
+        return sorted(message_ids)
+
+    async def _pinned_content(self, message: Message, content_type: str) -> str:
+        """Содержимое раздела закрепа; у разделенного на части сообщения - полный текст из outbox"""
+        rows = await self.db.outbox_sent_by_message(message.chat.id, message.message_id)
+        if rows and len(rows[0]['message_ids']) > 1:
+            text = self._prepare_content(rows[0]['text'], content_type)
+            return HTMLFormatter.plain_text(text, rows[0]['parse_mode'] == 'HTML').strip()
+        return self._extract_content(message)
+
+    async def _search_command(self, message: Message, command: CommandObject):
+        """/search <слова> [source:<источник>] [days:<N>] - поиск по сохраненным новостям"""
+        if str(message.chat.id) != str(Config.TELEGRAM_CHAT_ID):
+            return
+
+        terms, sources, days = [], [], None
+        for token in (command.args or '').split():
+            key, _, value = token.partition(':')
+            if key == 'source' and value:
+                sources.append(value)
+            elif key == 'days' and value.isdigit():
+                days = int(value)
+            else:
+                terms.append(token)
+        if not terms:
+            await message.answer("Использование: /search нефть опек source:rbc days:7")
+            return
+
+        started = time.monotonic()
+        results = await self.db.search_news(' '.join(terms), sources, days, Config.SEARCH_LIMIT)
+        self.metrics.observe('db.search_news', time.monotonic() - started)
+        if not results:
+            await message.answer("Ничего не найдено")
+            return
+
+        lines = [
+            f"• <a href=\"{html.escape(row['url'] or '', quote=True)}\">{html.escape(row['title'] or row['url'] or '')}</a>"
+            f" — {html.escape(row['source'] or '')}, {(row['timestamp'] or '')[:16]}"
+            for row in results
+        ]
+        await self._send_parts(message.chat.id, f"🔎 <b>Найдено: {len(results)}</b>\n" + "\n".join(lines))
+
     async def _edit_existing_message(self, text: str):
         """Редактирует существующее закрепленное сообщение"""
-        await self.bot.edit_message_text(
-            chat_id=Config.TARGET_CHANNEL_ID,
+        await self._api(
+            self.bot.edit_message_text,
+            Config.TARGET_CHANNEL_ID,
             message_id=self.pinned_message_id,
             text=text,
             parse_mode='HTML'
         )
 
-    async def _process_pinned_update(self, callback: CallbackQuery, content_type: str):
-        """Обновляет закреп с сохранением состояния"""
-        try:
-            now_str = datetime.now().strftime('%H:%M')
-            raw_content = self._extract_content(callback.message)  # Исправленное имя метода
-            
-            # Обновляем только текущий раздел
-            self.sections[content_type] = {
-                'content': raw_content,
-                'time': now_str,
-                'emoji': self.sections[content_type]['emoji']
-            }
-            
-            # Сохраняем в БД
-            self.db.save_pinned_section(content_type, raw_content, now_str)
-            
-            # Формируем полное сообщение
+    def _process_pinned_update(self, content_type: str, raw_content: str):
+        """Обновляет раздел закрепа в памяти и БД и планирует отложенную правку сообщения"""
+        # Тот же контент: время "обновлено" не меняем, иначе текст закрепа (и его хэш)
+        # менялся бы каждую минуту и закреп правился бы без изменений
+        if self.sections[content_type]['content'] == raw_content:
+            logger.debug(f"Pinned section {content_type} unchanged, update skipped")
+            return
+
+        now_str = datetime.now().strftime('%H:%M')
+        
+        # Обновляем только текущий раздел
+        self.sections[content_type] = {
+            'content': raw_content,
+            'time': now_str,
+            'emoji': self.sections[content_type]['emoji']
+        }
+        
+        # Сохраняем в БД
+        self.db.save_pinned_section(content_type, raw_content, now_str)
+
+        # Уже запланированная правка подхватит и этот раздел
+        if self._pinned_flush_task is None or self._pinned_flush_task.done():
+            self._pinned_flush_task = asyncio.create_task(self._flush_pinned())
+
+    async def _flush_pinned(self):
+        """Правит закреп один раз за окно и только если итоговый текст изменился"""
+        await asyncio.sleep(Config.PINNED_EDIT_WINDOW)
+        # Обновления после этой точки запланируют следующую правку
+        self._pinned_flush_task = None
+
+        async with self._pinned_lock:
             full_text = self._build_pinned_message()
-            
-            if self.pinned_message_id:
+            text_hash = hashlib.blake2b(full_text.encode('utf-8'), digest_size=16).hexdigest()
+            if text_hash == self._pinned_hash:
+                logger.debug("Pinned message unchanged, edit skipped")
+                return
+
+            try:
+                if self.pinned_message_id:
+                    try:
+                        await self._api(
+                            self.bot.edit_message_text,
+                            Config.TARGET_CHANNEL_ID,
+                            message_id=self.pinned_message_id,
+                            text=full_text,
+                            parse_mode='HTML'
+                        )
+                        logger.info(f"Updated pinned message {self.pinned_message_id}")
+                    except TelegramBadRequest as e:
+                        if 'message is not modified' not in str(e):
+                            raise
+                        logger.debug("Pinned message already up to date")
+                else:
+                    await self._create_new_pinned_message(full_text)
+                self._pinned_hash = text_hash
+            except Exception as e:
+                logger.warning(f"Edit failed: {e}, creating new message")
                 try:
-                    await self.bot.edit_message_text(
-                        chat_id=Config.TARGET_CHANNEL_ID,
-                        message_id=self.pinned_message_id,
-                        text=full_text,
-                        parse_mode='HTML'
-                    )
-                    logger.info(f"Updated pinned message {self.pinned_message_id}")
-                except Exception as e:
-                    logger.warning(f"Edit failed: {e}, creating new message")
                     await self._create_new_pinned_message(full_text)
-            else:
-                await self._create_new_pinned_message(full_text)
-                
-        except Exception as e:
-            logger.error(f"Failed to update pinned: {e}")
-            raise
+                    self._pinned_hash = text_hash
+                except Exception as e:
+                    logger.error(f"Failed to update pinned: {e}")
 
     def _preserve_formatting(self, content: str, content_type: str) -> str:
         """Сохраняет эмодзи и форматирование в контенте"""
@@ -179,32 +571,17 @@ class TelegramClient:
         # Для других типов сохраняем цветовые маркеры
         return content.replace('🟢', '').replace('🔴', '').replace('⚪', '')
 
-    def _build_pinned_message(self) -> str:
-        """Собирает сообщение с сохранением всех эмодзи и форматирования"""
-        sections = []
-        titles = {
-            'stocks': 'Рынок акций и индексы',
-            'dividends': 'Ближайшие дивиденды',
-            'commodities': 'Товарные активы',
-            'crypto': 'Топ-10 криптовалют'
-        }
-        
-        for content_type, data in self.sections.items():
-            if data['content']:
-                title = f"{data['emoji']} <b>{titles[content_type]} (обновлено {data['time']}):</b>"
-                sections.append(f"{title}\n{data['content']}")
-        
-        return '\n\n'.join(sections)
-
     async def _create_new_pinned_message(self, text: str):
         """Создает новое закрепленное сообщение"""
-        msg = await self.bot.send_message(
-            chat_id=Config.TARGET_CHANNEL_ID,
+        msg = await self._api(
+            self.bot.send_message,
+            Config.TARGET_CHANNEL_ID,
             text=text,
             parse_mode='HTML'
         )
-        await self.bot.pin_chat_message(
-            chat_id=Config.TARGET_CHANNEL_ID,
+        await self._api(
+            self.bot.pin_chat_message,
+            Config.TARGET_CHANNEL_ID,
             message_id=msg.message_id,
             disable_notification=True
         )
@@ -254,8 +631,16 @@ class TelegramClient:
         
         return '\n\n'.join(sections) if sections else "Нет данных для отображения"
 
-    async def safe_send(self, text: str, image_path: str = None, content_type: str = None, parse_mode: str = 'HTML') -> bool:
-        """Отправка сообщения с разной логикой для разных типов"""
+    async def safe_send(self, text: str, image: bytes = None, content_type: str = None, parse_mode: str = 'HTML',
+                        wait: bool = False, news: list = None, key: str = None, review_only: bool = False) -> bool:
+        """Ставит сообщение (с фото из байтов image) в outbox для всех чатов типа контента
+        (Config.destinations); с wait=True дожидается доставки во все.
+
+        news - строки (news_id, source, title, url), которые будут записаны в БД после доставки.
+        key - ключ идемпотентности; по умолчанию хэш содержимого, так что повтор еще не
+        отправленного сообщения не ставится второй раз.
+        review_only - служебное сообщение (статус, ошибка парсера): только в чат модерации TELEGRAM_CHAT_ID.
+        """
         try:
             if parse_mode != 'HTML':
                 text = self._clean_text(text)
@@ -263,64 +648,128 @@ class TelegramClient:
             # Автодетект типа контента, если не указан
             if not content_type:
                 content_type = self._detect_content_type(text)
-    
-            # Для всех типов (включая новости) отправляем с кнопками
-            return await self._send_with_controls(text, image_path, content_type, parse_mode)
+
+            if key is None:
+                digest = hashlib.blake2b(f"{content_type}|{text}".encode('utf-8'), digest_size=16)
+                if image:
+                    digest.update(image)
+                key = digest.hexdigest()
+
+            futures = []
+            chats = [str(Config.TELEGRAM_CHAT_ID)] if review_only else Config.destinations(content_type)
+            for chat_id in chats:
+                outbox_id = await self.db.outbox_add(
+                    f"{key}|{chat_id}", chat_id, text, image, content_type, parse_mode, news or []
+                )
+                if outbox_id is None:
+                    logger.info(f"Message {key} is already waiting in outbox for {chat_id}")
+                    continue
+                if wait:
+                    futures.append(asyncio.get_running_loop().create_future())
+                    self._outbox_waiters[outbox_id] = futures[-1]
+                self._wake_lane(chat_id)
+            return all(await asyncio.gather(*futures)) if wait else True
 
         except Exception as e:
             logger.error(f"Send error: {e}")
             return False
         
-    async def _send_with_pin_controls(self, text: str, image_path: str, content_type: str, parse_mode: str) -> bool:
+    async def _send_with_pin_controls(self, text: str, image: bytes, content_type: str, parse_mode: str) -> bool:
         """Отправка с кнопками управления закрепом"""
         keyboard = InlineKeyboardMarkup(inline_keyboard=[[
             InlineKeyboardButton(text="📌 Обновить закреп", callback_data=f"update_pinned_{content_type}"),
             InlineKeyboardButton(text="🗑 Удалить", callback_data="delete_message")
         ]])
     
-        try:
-            if image_path and Path(image_path).exists():
-                await self.bot.send_photo(
-                    chat_id=Config.TELEGRAM_CHAT_ID,
-                    photo=FSInputFile(image_path),
-                    caption=text[:1020] if len(text) > 1020 else text,
-                    parse_mode=parse_mode,
-                    reply_markup=keyboard
-                )
-            else:
-                await self.bot.send_message(
-                    chat_id=Config.TELEGRAM_CHAT_ID,
-                    text=text,
-                    parse_mode=parse_mode,
-                    reply_markup=keyboard
-                )
-            return True
-        finally:
-            if image_path and Path(image_path).exists():
-                Path(image_path).unlink(missing_ok=True)
+        await self._send_parts(Config.TELEGRAM_CHAT_ID, text, image, parse_mode, keyboard)
+        return True
 
-    async def _forward_news(self, text: str, image_path: str, parse_mode: str) -> bool:
+    async def _forward_news(self, text: str, image: bytes, parse_mode: str) -> bool:
         """Простая пересылка новостей в канал"""
-        try:
-            if image_path and Path(image_path).exists():
-                await self.bot.send_photo(
-                    chat_id=Config.TARGET_CHANNEL_ID,
-                    photo=FSInputFile(image_path),
-                    caption=text[:1020] if len(text) > 1020 else text,
-                    parse_mode=parse_mode
-                )
-            else:
-                await self.bot.send_message(
-                    chat_id=Config.TARGET_CHANNEL_ID,
-                    text=text,
-                    disable_web_page_preview=True,
-                    parse_mode=parse_mode
+        await self._send_parts(Config.TARGET_CHANNEL_ID, text, image, parse_mode)
+        return True
+
+    def _photo_media(self, image: bytes):
+        """file_id уже загруженного изображения или файл из памяти для загрузки"""
+        digest = hashlib.blake2b(image, digest_size=16).hexdigest()
+        file_id = self._photo_file_ids.get(digest)
+        if file_id:
+            self._photo_file_ids.move_to_end(digest)
+            return file_id
+        extension = 'jpg' if image[:2] == b'\xff\xd8' else 'png'
+        return BufferedInputFile(image, filename=f"{digest}.{extension}")
+
+    def _remember_photo(self, image: bytes, message: Message):
+        """Запоминает file_id отправленного фото (самый большой размер из тех, что вернул Telegram)"""
+        self._photo_file_ids[hashlib.blake2b(image, digest_size=16).hexdigest()] = message.photo[-1].file_id
+        if len(self._photo_file_ids) > Config.PHOTO_CACHE_SIZE:
+            self._photo_file_ids.popitem(last=False)
+
+    async def _send_photo(self, chat_id, image: bytes, **kwargs):
+        """Отправка фото из памяти; уже загруженное изображение уходит по file_id без повторной загрузки"""
+        photo = self._photo_media(image)
+        if isinstance(photo, str):
+            try:
+                return await self._api(self.bot.send_photo, chat_id, photo=photo, **kwargs)
+            except TelegramBadRequest as e:
+                logger.warning(f"Cached file_id rejected: {e}, uploading again")
+                self._photo_file_ids.pop(hashlib.blake2b(image, digest_size=16).hexdigest(), None)
+                photo = self._photo_media(image)
+
+        message = await self._api(self.bot.send_photo, chat_id, photo=photo, **kwargs)
+        self._remember_photo(image, message)
+        return message
+
+    async def _send_parts(self, chat_id, text: str, image: bytes = None, parse_mode: str = 'HTML',
+                          reply_markup: InlineKeyboardMarkup = None, sent: list = None) -> list:
+        """Отправляет текст с учетом лимитов длины Telegram и возвращает ID отправленных сообщений.
+
+        Длинный текст делится по строкам на несколько сообщений, не превышающая 1024 символа часть
+        подписи к фото остается в подписи, продолжение уходит текстовыми ответами на фото.
+        Кнопки прикрепляются к последнему сообщению; обработчики кнопок находят остальные части
+        по message_ids в outbox.
+
+        sent - ID частей, уже доставленных прошлой попыткой: они пропускаются. Список дополняется
+        по мере отправки, так что после ошибки в нем остаются ID принятых Telegram частей.
+        """
+        is_html = parse_mode == 'HTML'
+        reply_to = None
+        message_ids = sent if sent is not None else []
+        if image:
+            parts = HTMLFormatter.split_html(text, MAX_MESSAGE_LENGTH, first_limit=MAX_CAPTION_LENGTH, is_html=is_html)
+            if not message_ids:
+                photo = await self._send_photo(
+                    chat_id,
+                    image,
+                    caption=parts[0],
+                    parse_mode=parse_mode,
+                    reply_markup=reply_markup if len(parts) == 1 else None
                 )
-            return True
-        finally:
-            if image_path and Path(image_path).exists():
-                Path(image_path).unlink(missing_ok=True)
-                
+                message_ids.append(photo.message_id)
+            parts = parts[1:]
+            reply_to = message_ids[0]
+            done = len(message_ids) - 1
+        else:
+            parts = HTMLFormatter.split_html(text, MAX_MESSAGE_LENGTH, is_html=is_html)
+            if len(parts) > 1:
+                logger.info(f"Message of {len(text)} chars split into {len(parts)} parts")
+            done = len(message_ids)
+
+        for i, part in enumerate(parts, 1):
+            if i <= done:
+                continue
+            message = await self._api(
+                self.bot.send_message,
+                chat_id,
+                text=part,
+                parse_mode=parse_mode,
+                disable_web_page_preview=True,
+                reply_to_message_id=reply_to,
+                reply_markup=reply_markup if i == len(parts) else None
+            )
+            message_ids.append(message.message_id)
+        return message_ids
+
     def _prepare_content(self, text: str, content_type: str) -> str:
         """Подготовка контента с сохранением эмодзи"""
         if not text:
@@ -338,11 +787,16 @@ class TelegramClient:
         
         return text
                 
-    async def _send_with_controls(self, text: str, image_path: str, content_type: str, parse_mode: str) -> bool:
-        """Отправка сообщения с соответствующими кнопками"""
+    async def _send_with_controls(self, text: str, image: bytes, content_type: str, parse_mode: str,
+                                  chat_id=None, sent: list = None) -> list:
+        """Отправка сообщения с соответствующими кнопками; возвращает ID отправленных сообщений"""
         text = self._prepare_content(text, content_type)
+        chat_id = chat_id or Config.TELEGRAM_CHAT_ID
+        # Кнопки модерации нужны только в чате модерации
+        if str(chat_id) != str(Config.TELEGRAM_CHAT_ID):
+            keyboard = None
         # Для новостей - кнопка "Переслать в канал"
-        if content_type == 'news':
+        elif content_type == 'news':
             keyboard = InlineKeyboardMarkup(inline_keyboard=[[
                 InlineKeyboardButton(text="📌 Переслать в канал", callback_data="forward_to_channel"),
                 InlineKeyboardButton(text="🗑 Удалить", callback_data="delete_message")
@@ -354,27 +808,7 @@ class TelegramClient:
                 InlineKeyboardButton(text="🗑 Удалить", callback_data="delete_message")
             ]])
 
-        try:
-            if image_path and Path(image_path).exists():
-                await self.bot.send_photo(
-                    chat_id=Config.TELEGRAM_CHAT_ID,
-                    photo=FSInputFile(image_path),
-                    caption=text[:1020] if len(text) > 1020 else text,
-                    parse_mode=parse_mode,
-                    reply_markup=keyboard
-                )
-            else:
-                await self.bot.send_message(
-                    chat_id=Config.TELEGRAM_CHAT_ID,
-                    text=text,
-                    parse_mode=parse_mode,
-                    disable_web_page_preview=True,
-                    reply_markup=keyboard
-                )
-            return True
-        finally:
-            if image_path and Path(image_path).exists():
-                Path(image_path).unlink(missing_ok=True)
+        return await self._send_parts(chat_id, text, image, parse_mode, keyboard, sent)
 
     def _detect_content_type(self, text: str) -> str:
         """Определение типа контента с учетом новостей"""
@@ -1,8 +1,18 @@
 from typing import List
+import html
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Лимиты Telegram на длину видимого текста (после разбора HTML), в единицах UTF-16
+MAX_MESSAGE_LENGTH = 4096
+MAX_CAPTION_LENGTH = 1024
+
+TAG_RE = re.compile(r'<(/?)([a-zA-Z][\w-]*)[^>]*>')
+# Неделимые куски текста: HTML-сущность или один символ
+TEXT_ATOM_RE = re.compile(r'&#?\w+;|.', re.DOTALL)
+
 class HTMLFormatter:
     @staticmethod
     def format_news_with_priority(news_items: List[str]) -> str:
@@ -41,4 +51,98 @@ class HTMLFormatter:
             message_parts.append("\n🔵 <b>ДРУГИЕ НОВОСТИ</b>")
             message_parts.extend(f"• {item}" for item in medium_priority[:20])
 
-        return "\n".join(message_parts) if message_parts else "ℹ️ Нет новых значимых новостей"
\ No newline at end of file
+        return "\n".join(message_parts) if message_parts else "ℹ️ Нет новых значимых новостей"
+
+    @staticmethod
+    def plain_text(text: str, is_html: bool = True) -> str:
+        """Текст так, как его показывает Telegram: без тегов, с раскрытыми сущностями"""
+        return html.unescape(TAG_RE.sub('', text)) if is_html else text
+
+    @staticmethod
+    def visible_length(text: str, is_html: bool = True) -> int:
+        """Длина текста так, как ее считает Telegram: без тегов, с раскрытыми сущностями, в UTF-16"""
+        return len(HTMLFormatter.plain_text(text, is_html).encode('utf-16-le')) // 2
+
+    @staticmethod
+    def _split_line(line: str, limit: int, is_html: bool) -> List[str]:
+        """Режет слишком длинную строку по словам, а слово длиннее лимита - по символам"""
+        tokens = re.split(r'(<[^>]+>)', line) if is_html else [line]
+        pieces, current, current_len = [], '', 0
+        for token in tokens:
+            if not token:
+                continue
+            if is_html and token.startswith('<'):
+                current += token  # Теги не занимают места в видимом тексте
+                continue
+            for word in re.split(r'(?<= )', token):
+                atoms = TEXT_ATOM_RE.findall(word) if is_html else list(word)
+                word_len = HTMLFormatter.visible_length(word, is_html)
+                if current_len + word_len > limit and current_len:
+                    pieces.append(current)
+                    current, current_len = '', 0
+                if word_len <= limit:
+                    current += word
+                    current_len += word_len
+                    continue
+                for atom in atoms:
+                    atom_len = HTMLFormatter.visible_length(atom, is_html)
+                    if current_len + atom_len > limit:
+                        pieces.append(current)
+                        current, current_len = '', 0
+                    current += atom
+                    current_len += atom_len
+        if current:
+            pieces.append(current)
+        return pieces
+
+    @staticmethod
+    def _balance_tags(chunks: List[str]) -> List[str]:
+        """Закрывает теги, открытые в конце части, и заново открывает их в начале следующей"""
+        balanced = []
+        open_tags = []  # [(имя, открывающий тег)]
+        for chunk in chunks:
+            prefix = ''.join(tag for _, tag in open_tags)
+            for match in TAG_RE.finditer(chunk):
+                closing, name = match.group(1), match.group(2).lower()
+                if not closing:
+                    open_tags.append((name, match.group(0)))
+                elif open_tags and open_tags[-1][0] == name:
+                    open_tags.pop()
+            suffix = ''.join(f'</{name}>' for name, _ in reversed(open_tags))
+            balanced.append(prefix + chunk + suffix)
+        return balanced
+
+    @staticmethod
+    def split_html(text: str, limit: int = MAX_MESSAGE_LENGTH, first_limit: int = None,
+                   is_html: bool = True) -> List[str]:
+        """Делит сообщение на части не длиннее limit (первую - не длиннее first_limit).
+
+        Границы выбираются между строками (новость дайджеста - одна строка), длинная строка
+        режется по словам. Теги подмножества HTML Telegram остаются сбалансированными в каждой части.
+        """
+        first_limit = first_limit or limit
+        if HTMLFormatter.visible_length(text, is_html) <= first_limit:
+            return [text]
+
+        chunks, current, current_len = [], [], 0
+        for line in text.split('\n'):
+            chunk_limit = first_limit if not chunks else limit
+            line_len = HTMLFormatter.visible_length(line, is_html)
+            # +1 за перевод строки между строками части
+            if current and current_len + 1 + line_len > chunk_limit:
+                chunks.append('\n'.join(current))
+                current, current_len = [], 0
+                chunk_limit = limit
+            if line_len > chunk_limit:
+                pieces = HTMLFormatter._split_line(line, chunk_limit, is_html)
+                chunks.extend(pieces[:-1])
+                line = pieces[-1]
+                line_len = HTMLFormatter.visible_length(line, is_html)
+            current.append(line)
+            current_len += line_len + (1 if len(current) > 1 else 0)
+        if current:
+            chunks.append('\n'.join(current))
+
+        # Пустые части (подряд идущие переводы строк на границе) Telegram не примет
+        chunks = [chunk for chunk in chunks if chunk.strip()]
+        return HTMLFormatter._balance_tags(chunks) if is_html else chunks
@@ -1,119 +1,175 @@
-import asyncio
-import logging
-from pathlib import Path
-import sqlite3
-from pathlib import Path
-from datetime import datetime
-from aiogram import Dispatcher
-from config import Config
-from services.telegram_client import TelegramClient
-from parsers.moex import MOEXParser
-from parsers.dividends import DividendsParser
-from parsers.news_ru import RussianNewsParser
-from parsers.tradingeconomics import TradingEconomicsParser
-from database import NewsDatabase
-from parsers.company_reports import CompanyReportsParser
-
-# Настройка логгирования
-logging.basicConfig(
-    level=Config.LOGGING['level'],
-    format=Config.LOGGING['format']
-)
-logger = logging.getLogger(__name__)
-
-async def check_database(db: NewsDatabase):
-    """Проверяет и восстанавливает структуру БД при необходимости"""
-    try:
-        # Простая проверка существования таблиц
-        with sqlite3.connect(Config.DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = {row[0] for row in cursor.fetchall()}
-            
-            required_tables = {'news', 'pinned_messages', 'pinned_sections'}
-            if not required_tables.issubset(tables):
-                logger.warning("Database tables missing, recreating...")
-                db._init_db()  # Пересоздаем структуру
-                logger.info("Database reinitialized successfully")
-    except Exception as e:
-        logger.error(f"Database check failed: {e}")
-        raise
-
-class EconomicParserBot:
-    def __init__(self):
-        # Удаление старой БД при необходимости
-        if Config.RECREATE_DB and Path(Config.DB_PATH).exists():
-            Path(Config.DB_PATH).unlink()
-        
-        # Инициализация БД (теперь db_path будет установлен автоматически)
-        self.db = NewsDatabase()
-        
-        # Проверка и восстановление БД
-        asyncio.run(check_database(self.db))
-        
-        # Инициализация Dispatcher и клиента Telegram
-        self.dp = Dispatcher()
-        self.tg = TelegramClient(self.dp, self.db)
-        
-        # Инициализация парсеров
-        self.parsers = [
-            MOEXParser(self.dp, self.db),
-            DividendsParser(self.dp, self.db),
-            RussianNewsParser(self.dp, self.db),
-            TradingEconomicsParser(self.dp, self.db),
-            CompanyReportsParser(self.dp, self.db)
-        ]
-
-    async def run_parsing(self):
-        """Запуск всех парсеров"""
-        logger.info("Starting parsing cycle")
-        
-        # Очистка старых новостей в полночь
-        now = datetime.now()
-        if now.hour == 0 and now.minute < 5:
-            await self.db.cleanup_old_news()
-        
-        results = await asyncio.gather(
-            *[parser.parse() for parser in self.parsers],
-            return_exceptions=True
-        )
-        
-        for parser, result in zip(self.parsers, results):
-            if isinstance(result, Exception):
-                logger.error(f"Parser {parser.__class__.__name__} failed: {result}")
-        
-        logger.info("Parsing cycle completed")
-        return all(not isinstance(r, Exception) for r in results)
-
-    async def periodic_update(self):
-        """Периодический запуск парсинга"""
-        while True:
-            try:
-                await self.run_parsing()
-            except Exception as e:
-                logger.error(f"Parsing failed: {e}", exc_info=True)
-            await asyncio.sleep(Config.UPDATE_INTERVAL)
-
-    async def start(self):
-        """Запуск бота"""
-        try:
-            await self.tg.bot.delete_webhook(drop_pending_updates=True)
-            asyncio.create_task(self.periodic_update())
-            await self.dp.start_polling(self.tg.bot)
-        except Exception as e:
-            logger.critical(f"Bot failed: {e}")
-            raise
-
-if __name__ == "__main__":
-    # Удаление старой БД при необходимости (для тестов)
-    if Config.RECREATE_DB and Path(Config.DB_PATH).exists():
-        Path(Config.DB_PATH).unlink()
-        logger.info("Old database removed")
-
-    bot = EconomicParserBot()
-    try:
-        asyncio.run(bot.start())
-    except KeyboardInterrupt:
-        logger.info("Bot stopped by user")
-    except Exception as e:
+import asyncio
+import logging
+import secrets
+from aiohttp import web
+from datetime import datetime
+from aiogram import Dispatcher
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from config import Config
+from services.telegram_client import TelegramClient
+from services.browser_pool import BrowserPool
+from services.http_client import HttpClient
+from services.listing_cache import ListingCache
+from services.market_snapshots import MarketSnapshots
+from services.scheduler import Scheduler
+from parsers.moex import MOEXParser
+from parsers.dividends import DividendsParser
+from parsers.news_ru import RussianNewsParser
+from parsers.tradingeconomics import TradingEconomicsParser
+from database import NewsDatabase
+from parsers.company_reports import CompanyReportsParser
+
+# Настройка логгирования
+logging.basicConfig(
+    level=Config.LOGGING['level'],
+    format=Config.LOGGING['format']
+)
+logger = logging.getLogger(__name__)
+
+class EconomicParserBot:
+    def __init__(self):
+        # Инициализация БД: недостающие миграции схемы применяются на месте, история дедупликации сохраняется
+        self.db = NewsDatabase()
+        
+        # Инициализация Dispatcher и единственного клиента Telegram: один Bot, одна HTTP-сессия
+        # и одна копия разделов закрепа на весь процесс, обработчики регистрируются один раз
+        self.dp = Dispatcher()
+        self.tg = TelegramClient(self.dp, self.db)
+        
+        # Общий пул Chromium для всех парсеров
+        self.browser = BrowserPool()
+        
+        # Общий HTTP-клиент для новостных источников с кэшем страниц-списков
+        self.listing_cache = ListingCache(self.db)
+        self.http = HttpClient(self.listing_cache)
+
+        # Последние снимки рыночных разделов: неизменившиеся таблицы не публикуются повторно
+        self.snapshots = MarketSnapshots(self.db)
+        
+        # Инициализация парсеров (ключи совпадают с Config.SCHEDULE)
+        self.parsers = {
+            'moex': MOEXParser(self.tg, self.db, self.browser, self.snapshots),
+            'dividends': DividendsParser(self.tg, self.db, self.browser, self.snapshots),
+            'news': RussianNewsParser(self.tg, self.db, self.browser, self.http),
+            'tradingeconomics': TradingEconomicsParser(self.tg, self.db, self.browser, self.snapshots),
+            'company_reports': CompanyReportsParser(self.tg, self.db, self.browser, self.listing_cache)
+        }
+
+        # У каждого парсера свое расписание; запуск пропускается, пока идет предыдущий
+        self.scheduler = Scheduler()
+        for name, parser in self.parsers.items():
+            self.scheduler.add(name, parser.parse, Config.SCHEDULE[name], jitter=Config.SCHEDULE_JITTER)
+        self.scheduler.add('maintenance', self.maintenance, Config.SCHEDULE['maintenance'], run_at_start=False)
+        self.scheduler.add('metrics', self.log_metrics, Config.SCHEDULE['metrics'], run_at_start=False)
+
+        self.dp.message.register(self.run_command, Command('run'))
+        self.dp.message.register(self.stats_command, Command('stats'))
+
+    async def run_command(self, message: Message, command: CommandObject):
+        """Ручной запуск: /run - состояние задач, /run <имя> или /run all - внеочередной запуск"""
+        if str(message.chat.id) != str(Config.TELEGRAM_CHAT_ID):
+            return
+
+        name = (command.args or '').strip()
+        if not name:
+            lines = [f"• {job}: {status or 'еще не запускался'}" for job, status in self.scheduler.status().items()]
+            await message.answer("Задачи:\n" + "\n".join(lines))
+            return
+
+        names = list(self.parsers) if name == 'all' else [name]
+        unknown = [job for job in names if job not in self.scheduler.jobs]
+        if unknown:
+            await message.answer(f"Неизвестная задача: {', '.join(unknown)}")
+            return
+
+        started = [job for job in names if self.scheduler.trigger(job)]
+        skipped = [job for job in names if job not in started]
+        reply = f"Запущено: {', '.join(started)}" if started else "Ничего не запущено"
+        if skipped:
+            reply += f"\nУже выполняются: {', '.join(skipped)}"
+        await message.answer(reply)
+
+    async def maintenance(self):
+        """Обслуживание БД; сжатие файла - только пока не работает ни один парсер"""
+        await self.db.run_maintenance(
+            is_idle=lambda: not any(self.scheduler.is_running(name) for name in self.parsers)
+        )
+
+    async def log_metrics(self):
+        self.tg.metrics.log_summary()
+
+    async def stats_command(self, message: Message):
+        """/stats - задержки и ошибки вызовов Bot API и обработчиков кнопок с момента запуска"""
+        if str(message.chat.id) != str(Config.TELEGRAM_CHAT_ID):
+            return
+        lines = self.tg.metrics.summary()
+        await message.answer("Bot API:\n" + "\n".join(lines) if lines else "Вызовов Bot API еще не было")
+
+    async def metrics_endpoint(self, request: web.Request) -> web.Response:
+        """Метрики для Prometheus на том же сервере, что и webhook"""
+        return web.Response(text=self.tg.metrics.render_prometheus(), content_type='text/plain')
+
+    async def run_webhook(self):
+        """Прием обновлений через webhook на встроенном aiohttp-сервере"""
+        secret = Config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+        workers = asyncio.Semaphore(Config.WEBHOOK_WORKERS)
+
+        # Обновления обрабатываются в фоне; семафор ограничивает число одновременных обработчиков
+        async def limit_workers(handler, event, data):
+            async with workers:
+                return await handler(event, data)
+
+        self.dp.update.outer_middleware(limit_workers)
+
+        app = web.Application()
+        # Запросы без верного X-Telegram-Bot-Api-Secret-Token отклоняются с 401
+        SimpleRequestHandler(dispatcher=self.dp, bot=self.tg.bot, secret_token=secret).register(app, path=Config.WEBHOOK_PATH)
+        app.router.add_get('/metrics', self.metrics_endpoint)
+        setup_application(app, self.dp, bot=self.tg.bot)
+
+        runner = web.AppRunner(app)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT).start()
+            await self.tg.bot.set_webhook(
+                url=Config.WEBHOOK_URL.rstrip('/') + Config.WEBHOOK_PATH,
+                secret_token=secret,
+                max_connections=Config.WEBHOOK_WORKERS,
+                allowed_updates=self.dp.resolve_used_update_types(),
+                drop_pending_updates=True
+            )
+            logger.info(f"Webhook server listening on {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    async def start(self):
+        """Запуск бота"""
+        try:
+            await self.tg.start_sender()
+            self.scheduler.start()
+            if Config.WEBHOOK_ENABLED:
+                await self.run_webhook()
+            else:
+                await self.tg.bot.delete_webhook(drop_pending_updates=True)
+                await self.dp.start_polling(self.tg.bot)
+        except Exception as e:
+            logger.critical(f"Bot failed: {e}")
+            raise
+        finally:
+            await self.scheduler.stop()
+            await self.http.close()
+            await self.browser.close()
+            await self.tg.close()
+            self.db.close()
+
+if __name__ == "__main__":
+    bot = EconomicParserBot()
+    try:
+        asyncio.run(bot.start())
+    except KeyboardInterrupt:
+        logger.info("Bot stopped by user")
+    except Exception as e:
         logger.critical(f"Critical error: {e}")
\ No newline at end of file
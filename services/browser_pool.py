@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class BrowserPool:
+    """Общий на процесс экземпляр Chromium, выдающий парсерам изолированные контексты"""
+
+    def __init__(self, max_pages: int = None, recycle_after: int = None):
+        self.max_pages = max_pages or Config.BROWSER_MAX_PAGES
+        self.recycle_after = recycle_after or Config.BROWSER_RECYCLE_AFTER
+        self.launch_timeout = 90000  # 90 секунд на запуск браузера
+
+        self._playwright = None
+        self._browser = None
+        self._navigations = 0
+        self._leases = defaultdict(int)  # {browser: количество выданных страниц}
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_pages)
+
+    async def _launch(self):
+        """Запуск нового экземпляра браузера"""
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(
+            headless=True,
+            timeout=self.launch_timeout
+        )
+        self._navigations = 0
+        logger.info("Chromium launched")
+
+    async def _acquire_browser(self):
+        """Возвращает рабочий браузер, перезапуская его после recycle_after переходов"""
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                await self._launch()
+            elif self._navigations >= self.recycle_after:
+                logger.info(f"Recycling Chromium after {self._navigations} navigations")
+                retired = self._browser
+                await self._launch()
+                # Старый браузер закрывается, когда вернут его последнюю страницу
+                if not self._leases.get(retired):
+                    self._leases.pop(retired, None)
+                    await self._close_browser(retired)
+
+            self._leases[self._browser] += 1
+            return self._browser
+
+    async def _release_browser(self, browser):
+        async with self._lock:
+            self._leases[browser] -= 1
+            if browser is not self._browser and self._leases[browser] <= 0:
+                self._leases.pop(browser, None)
+                await self._close_browser(browser)
+
+    @staticmethod
+    async def _close_browser(browser):
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.warning(f"Browser close error: {str(e)[:100]}")
+
+    def _on_navigated(self, browser, page, frame):
+        if browser is self._browser and frame == page.main_frame:
+            self._navigations += 1
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Выдает изолированный контекст, в котором можно открыть несколько страниц"""
+        browser = await self._acquire_browser()
+        context = None
+        try:
+            context = await browser.new_context(**context_options)
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.warning(f"Context close error: {str(e)[:100]}")
+            await self._release_browser(browser)
+
+    @asynccontextmanager
+    async def page(self, context=None, **context_options):
+        """Выдает страницу с учетом лимита одновременных страниц.
+
+        Без context страница открывается в собственном контексте, иначе в переданном.
+        """
+        async with self._semaphore:
+            if context is None:
+                async with self.context(**context_options) as own_context:
+                    async with self._open_page(own_context) as page:
+                        yield page
+            else:
+                async with self._open_page(context) as page:
+                    yield page
+
+    @asynccontextmanager
+    async def _open_page(self, context):
+        browser = context.browser
+        page = await context.new_page()
+        page.on('framenavigated', lambda frame: self._on_navigated(browser, page, frame))
+        try:
+            yield page
+        finally:
+            try:
+                await page.close()
+            except Exception as e:
+                logger.warning(f"Page close error: {str(e)[:100]}")
+
+    async def close(self):
+        """Закрытие браузера и Playwright при остановке процесса"""
+        async with self._lock:
+            browsers = set(self._leases) | ({self._browser} if self._browser else set())
+            for browser in browsers:
+                await self._close_browser(browser)
+            self._leases.clear()
+            self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+        logger.info("Browser pool closed")
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import aiohttp
+from typing import Optional, Tuple
+from config import Config
+from services.listing_cache import ListingCache
+
+logger = logging.getLogger(__name__)
+
+# aiohttp распаковывает br только при установленном пакете Brotli
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class HttpClient:
+    """Общий асинхронный HTTP-клиент с пулом keep-alive соединений"""
+
+    def __init__(self, cache: ListingCache = None):
+        self.cache = cache  # Валидаторы и хэши страниц-списков
+        self.timeout = aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT)
+        self.headers = {
+            'User-Agent': Config.HTTP_USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
+            'Accept-Encoding': ACCEPT_ENCODING
+        }
+        self._session = None
+        self._lock = asyncio.Lock()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Ленивое создание сессии внутри работающего event loop"""
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=Config.HTTP_MAX_CONNECTIONS,
+                    limit_per_host=Config.HTTP_MAX_PER_HOST,
+                    ttl_dns_cache=300
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers=self.headers,
+                    timeout=self.timeout
+                )
+            return self._session
+
+    async def get_text(self, url: str, headers: dict = None, timeout: int = None) -> str:
+        """GET-запрос, возвращающий тело ответа как текст"""
+        session = await self._get_session()
+        kwargs = {'headers': headers}
+        if timeout:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+        async with session.get(url, **kwargs) as response:
+            response.raise_for_status()
+            return await response.text(errors='replace')
+
+    async def get_listing(self, url: str, marker: str = None, timeout: int = None) -> Tuple[Optional[str], Optional[tuple]]:
+        """Условная загрузка страницы-списка.
+
+        Возвращает (текст, валидаторы). Текст None, если сервер ответил 304 или хэш значимой части
+        (см. ListingCache.digest) не изменился с прошлого раза - такую страницу не нужно разбирать повторно.
+        Валидаторы (url, content_hash, etag, last_modified) новой страницы не сохраняются здесь:
+        вызывающий код передает их в ListingCache.remember, когда новости со страницы обработаны.
+        """
+        if self.cache is None:
+            return await self.get_text(url, timeout=timeout), None
+
+        session = await self._get_session()
+        kwargs = {'headers': self.cache.request_headers(url)}
+        if timeout:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+        async with session.get(url, **kwargs) as response:
+            if response.status == 304:
+                logger.debug(f"Listing not modified: {url}")
+                return None, None
+            response.raise_for_status()
+            text = await response.text(errors='replace')
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+
+        content_hash = self.cache.digest(text, marker)
+        if self.cache.is_unchanged(url, content_hash):
+            # Содержимое уже обработано, обновляются только валидаторы
+            self.cache.remember(url, content_hash, etag, last_modified)
+            logger.debug(f"Listing content unchanged: {url}")
+            return None, None
+        return text, (url, content_hash, etag, last_modified)
+
+    def remember_listings(self, listings: list):
+        """Сохраняет валидаторы из get_listing для страниц, новости с которых обработаны"""
+        for validators in listings:
+            if validators:
+                self.cache.remember(*validators)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        logger.info("HTTP client closed")
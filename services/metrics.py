@@ -0,0 +1,135 @@
+import logging
+import time
+from typing import Dict, List
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InputFile
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограммы задержек, сек
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Metrics:
+    """Счетчики и гистограммы задержек по именованным операциям (методы Bot API, обработчики)"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.stats: Dict[str, Dict] = {}
+
+    def _entry(self, name: str) -> Dict:
+        if name not in self.stats:
+            self.stats[name] = {
+                'count': 0,
+                'errors': 0,
+                'retry_after': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+                'bytes': 0,
+                'buckets': [0] * (len(LATENCY_BUCKETS) + 1)  # Последняя - больше максимальной границы
+            }
+        return self.stats[name]
+
+    def observe(self, name: str, duration: float, size: int = 0, error: Exception = None):
+        """Учитывает один вызов: длительность, размер запроса и ошибку (RetryAfter считается отдельно)"""
+        entry = self._entry(name)
+        entry['count'] += 1
+        entry['total_time'] += duration
+        entry['max_time'] = max(entry['max_time'], duration)
+        entry['bytes'] += size
+        if isinstance(error, TelegramRetryAfter):
+            entry['retry_after'] += 1
+        elif error is not None:
+            entry['errors'] += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                entry['buckets'][i] += 1
+                break
+        else:
+            entry['buckets'][-1] += 1
+
+    @staticmethod
+    def quantile(entry: Dict, q: float) -> float:
+        """Оценка квантиля по гистограмме - верхняя граница корзины, куда он попадает"""
+        rank = q * entry['count']
+        seen = 0
+        for i, count in enumerate(entry['buckets']):
+            seen += count
+            if count and seen >= rank:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else entry['max_time']
+        return 0.0
+
+    def summary(self) -> List[str]:
+        """Строки вида "send_message: 120 вызовов, p50 ≤0.25с, p95 ≤1с, ..." для лога и /stats"""
+        lines = []
+        for name, entry in sorted(self.stats.items()):
+            line = (
+                f"{name}: {entry['count']} вызовов, "
+                f"p50 ≤{self.quantile(entry, 0.5):g}с, p95 ≤{self.quantile(entry, 0.95):g}с, "
+                f"max {entry['max_time']:.2f}с"
+            )
+            if entry['errors'] or entry['retry_after']:
+                line += f", ошибок {entry['errors']}, 429: {entry['retry_after']}"
+            if entry['bytes']:
+                line += f", {entry['bytes'] / 1024:.0f} КБ"
+            lines.append(line)
+        return lines
+
+    def render_prometheus(self, prefix: str = 'economic_parser') -> str:
+        """Метрики в текстовом формате Prometheus"""
+        lines = [f"# TYPE {prefix}_call_seconds histogram"]
+        for name, entry in sorted(self.stats.items()):
+            label = f'name="{name}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, entry['buckets']):
+                cumulative += count
+                lines.append(f'{prefix}_call_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_call_seconds_bucket{{{label},le="+Inf"}} {entry["count"]}')
+            lines.append(f'{prefix}_call_seconds_sum{{{label}}} {entry["total_time"]:.6f}')
+            lines.append(f'{prefix}_call_seconds_count{{{label}}} {entry["count"]}')
+        for metric, key in (('errors', 'errors'), ('retry_after', 'retry_after'), ('request_bytes', 'bytes')):
+            lines.append(f"# TYPE {prefix}_call_{metric}_total counter")
+            for name, entry in sorted(self.stats.items()):
+                lines.append(f'{prefix}_call_{metric}_total{{name="{name}"}} {entry[key]}')
+        return '\n'.join(lines) + '\n'
+
+    def log_summary(self):
+        """Периодическая сводка в лог"""
+        lines = self.summary()
+        if lines:
+            logger.info("API metrics since start:\n" + "\n".join(lines))
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: замеряет каждый HTTP-вызов Bot API, включая повторы после RetryAfter"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    @staticmethod
+    def _payload_size(method) -> int:
+        """Примерный размер запроса: текстовые поля и загружаемые файлы"""
+        size = 0
+        for value in method.__dict__.values():
+            if isinstance(value, str):
+                size += len(value.encode('utf-8'))
+            elif isinstance(value, InputFile):
+                size += len(getattr(value, 'data', b''))
+        return size
+
+    async def __call__(self, make_request, bot, method):
+        started = time.monotonic()
+        error = None
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.metrics.observe(
+                f"api.{method.__api_method__}",
+                time.monotonic() - started,
+                size=self._payload_size(method),
+                error=error
+            )
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# config проверяет обязательные настройки при импорте
+for name, value in (('TELEGRAM_TOKEN', '123:test'), ('TELEGRAM_CHAT_ID', '-100'), ('TARGET_CHANNEL_ID', '-200')):
+    os.environ.setdefault(name, value)
+
+from aiogram import Dispatcher
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import SendMessage
+from config import Config
+from database import NewsDatabase
+from services.telegram_client import TelegramClient
+
+CHAT_ID = '-100'
+
+
+class OutboxOrderTest(unittest.IsolatedAsyncioTestCase):
+    """Очередь чата в outbox: сообщение, ждущее повтора, не обгоняют следующие за ним"""
+
+    async def asyncSetUp(self):
+        self._config = {
+            name: getattr(Config, name)
+            for name in ('TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID', 'NEWS_CHANNEL_ID', 'DESTINATIONS',
+                         'OUTBOX_RETRY_BASE', 'ALBUM_WAIT')
+        }
+        Config.TELEGRAM_TOKEN = '123:test'
+        Config.TELEGRAM_CHAT_ID = CHAT_ID
+        Config.NEWS_CHANNEL_ID = None
+        Config.DESTINATIONS = ''
+        Config.OUTBOX_RETRY_BASE = 0.2
+        Config.ALBUM_WAIT = 0
+
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db = NewsDatabase(Path(self._tmp.name) / 'test.db')
+        self.tg = TelegramClient(Dispatcher(), self.db)
+        self.sent = []  # Тексты в порядке появления в чате
+        self.fail_at = None  # Номер вызова send_message, который один раз упадет с сетевой ошибкой
+        self.tg._api = self._fake_api
+
+    async def asyncTearDown(self):
+        await self.tg.close()
+        self.db.close()
+        self._tmp.cleanup()
+        for name, value in self._config.items():
+            setattr(Config, name, value)
+
+    async def _fake_api(self, method, chat_id, **kwargs):
+        name = method.__name__
+        if name == 'send_message' and self.fail_at is not None:
+            self.fail_at -= 1
+            if self.fail_at == 0:
+                self.fail_at = None
+                raise TelegramNetworkError(method=SendMessage(chat_id=chat_id, text=''), message='timeout')
+        if name == 'send_media_group':
+            messages = []
+            for item in kwargs['media']:
+                self.sent.append(item.caption)
+                messages.append(self._message())
+            return messages
+        self.sent.append(kwargs.get('text') or kwargs.get('caption'))
+        return self._message()
+
+    def _message(self):
+        message_id = len(self.sent) + 1000
+        return types.SimpleNamespace(message_id=message_id, photo=[types.SimpleNamespace(file_id=f'f{message_id}')])
+
+    async def test_retry_keeps_chat_order(self):
+        digest = '\n'.join(f"дайджест {i} " + 'x' * 90 for i in range(100))
+        # Вторая часть дайджеста падает, пока фото-новости уже стоят в очереди за ним
+        self.fail_at = 2
+        await self.tg.safe_send(digest, content_type='news', news=[(1, 'test', 'digest', 'https://a')])
+        for i in range(3):
+            await self.tg.safe_send(f"фото {i}", image=b'\xff\xd8' + bytes([i]), content_type='news',
+                                    news=[(10 + i, 'test', f'photo {i}', f'https://p/{i}')])
+        await self.tg.start_sender()
+
+        for _ in range(100):
+            await asyncio.sleep(0.05)
+            if sum(1 for text in self.sent if text.startswith('фото')) == 3:
+                break
+
+        digest_parts = [i for i, text in enumerate(self.sent) if text.startswith('дайджест')]
+        photos = [i for i, text in enumerate(self.sent) if text.startswith('фото')]
+        self.assertEqual(len(digest_parts), 3)
+        self.assertEqual(len(photos), 3)
+        # Все части дайджеста подряд и до фото, ни одна часть не отправлена дважды
+        self.assertEqual(digest_parts, [0, 1, 2])
+        self.assertEqual(len(set(self.sent[i] for i in digest_parts)), 3)
+        self.assertGreater(min(photos), max(digest_parts))
+
+
+if __name__ == '__main__':
+    unittest.main()
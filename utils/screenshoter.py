@@ -1,21 +1,27 @@
-import logging
-from pathlib import Path
-from playwright.async_api import async_playwright
-
-logger = logging.getLogger(__name__)
-
-class Screenshoter:
-    @staticmethod
-    async def take_screenshot(url: str, selector: str, save_path: str) -> bool:
-        """Создание скриншота элемента страницы"""
-        try:
-            async with async_playwright() as pw:
-                browser = await pw.chromium.launch()
-                page = await browser.new_page()
-                await page.goto(url, timeout=60000)
-                element = await page.wait_for_selector(selector, timeout=30000)
-                await element.screenshot(path=save_path)
-                return True
-        except Exception as e:
-            logger.error(f"Screenshot failed: {str(e)}")
-            return False
\ No newline at end of file
+import logging
+from typing import Optional
+from config import Config
+from services.browser_pool import BrowserPool
+
+logger = logging.getLogger(__name__)
+
+class Screenshoter:
+    @staticmethod
+    async def capture(target) -> bytes:
+        """Скриншот элемента или страницы в памяти в формате из Config (JPEG заметно легче PNG)"""
+        options = {'type': Config.SCREENSHOT_FORMAT}
+        if Config.SCREENSHOT_FORMAT == 'jpeg':
+            options['quality'] = Config.SCREENSHOT_QUALITY
+        return await target.screenshot(**options)
+
+    @staticmethod
+    async def take_screenshot(browser: BrowserPool, url: str, selector: str) -> Optional[bytes]:
+        """Создание скриншота элемента страницы"""
+        try:
+            async with browser.page() as page:
+                await page.goto(url, timeout=60000)
+                element = await page.wait_for_selector(selector, timeout=30000)
+                return await Screenshoter.capture(element)
+        except Exception as e:
+            logger.error(f"Screenshot failed: {str(e)}")
+            return None